@@ -0,0 +1,40 @@
+import signal
+import threading
+
+import init
+from utils import AcquisitionManager, AcquisitionPublisher, metrics
+
+# Reads every device in this process and publishes the samples in shared memory.
+# Run it next to the dashboard started with acquisition_process: true, e.g.
+#   python acquire.py & gunicorn -w 4 -k gthread --threads 16 app:server
+# Threaded workers are needed for the /stream connections of live_updates: push.
+
+stopping = threading.Event()
+
+def request_stop(signum, frame):
+    stopping.set()
+
+signal.signal(signal.SIGINT, request_stop)
+signal.signal(signal.SIGTERM, request_stop)
+
+# Reading the config first registers the virtual devices before the first port scan.
+config = init.config.read()
+init.base.open()
+manager = AcquisitionManager(init.logger, init.base, shared=True)
+publisher = AcquisitionPublisher(init.logger, manager)
+reporter = metrics.MetricsReporter(init.logger)
+manager.start()
+publisher.start()
+reporter.start()
+init.base.start_compaction(config.get('cold_storage_age', 86400))
+init.logger.info('Acquisition process started.')
+
+try:
+    while not stopping.wait(1.0):
+        pass
+finally:
+    reporter.stop()
+    publisher.stop()
+    init.base.stop_compaction()
+    manager.stop()
+    init.logger.info('Acquisition process stopped.')
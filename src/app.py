@@ -1,31 +1,52 @@
+import functools
+import json
+import threading
+import time
+
 import dash
-import dash_core_components as dcc
-import dash_html_components as html
-from dash.dependencies import Input, Output, State
-import plotly.graph_objs as go
-import plotly.subplots as sp
-import random
+import flask
+import numpy as np
+from dash import dcc, html
+from dash.dependencies import Input, Output, State, ClientsideFunction
+
 import init
-from utils import PortScanner, SerialPortHandler
-from utils import ProtocolHandler
+from utils import metrics
+from utils.downsample import downsample
+from utils.health import alerts
+from utils.scheduler import ABORTED, DONE, MEASURING, PURGING
+from utils.signatures import extract_features
+from utils.snapshot_cache import SnapshotCache, DeltaFeed
 
-available_ports = PortScanner.port_list()
-ap = []
-for value in available_ports:
-    ap.append({"label": value, "value": value})
+# Nothing below reads the config, opens the database or scans ports at import:
+# settings() and get_manager() do it on first use, load_settings() completes the
+# layout when a page loads and update_devices() fills in the devices found.
 
-config = init.config.read()
+@functools.lru_cache(maxsize=None)
+def settings():
+    """
+    Returns the configuration, read once.
+    """
+    config = init.config.read()
+    if config["first_run"] == True:
+        config["first_run"] = False
+        init.config.write(config)
+    return config
 
-if config["first_run"] == True:
-    config["first_run"] = False
-    init.config.write(config)
+def modes():
+    return [{"label": f"Time {value} sec", "value": value} for value in settings()["measurement_modes"].values()]
 
-modes = []
-for _, value in config["measurement_modes"].items():
-    modes.append({"label": f"Time {value} sec", "value": value})
+def push_updates():
+    """
+    In push mode new samples reach the browser over /stream instead of the graph-extend polling.
+    """
+    return settings().get('live_updates', 'push') == 'push'
 
 external_stylesheets = ['/assets/styles.css']
+STREAM_INTERVAL = 0.02
+STREAM_HEARTBEAT = 15.0
+
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+server = app.server
 app.title = "Fuel Analytics: Understand Your fuel!"
 
 app.layout = html.Div(
@@ -51,12 +72,27 @@ app.layout = html.Div(
                 html.Div(
                     className="graph",
                     children=[
-                        dcc.Graph(id='live-graph', animate=True),
+                        dcc.Graph(id='live-graph'),
                         dcc.Interval(
                             id='graph-update',
                             interval=1*1000,  
                             n_intervals=0
                         ),
+                        dcc.Interval(
+                            id='graph-extend',
+                            interval=1*1000,
+                            n_intervals=0,
+                            disabled=True
+                        ),
+                        dcc.Interval(
+                            id='countdown-update',
+                            interval=250,
+                            n_intervals=0
+                        ),
+                        dcc.Store(id='graph-sequence'),
+                        dcc.Store(id='graph-width'),
+                        dcc.Store(id='stream-state'),
+                        dcc.Location(id='url'),
                     ]
                 ),
                 html.Div(
@@ -74,8 +110,7 @@ app.layout = html.Div(
                             children=[
                                 dcc.Dropdown(
                                     id='mode-dropdown',
-                                    options=modes,
-                                    value=modes[0]['value'],
+                                    options=[],
                                 )
                             ]
                         ),
@@ -84,7 +119,7 @@ app.layout = html.Div(
                             children=[
                                 dcc.Dropdown(
                                     id="device-dropdown",
-                                    options=ap
+                                    options=[]
                                 )
                             ]
                         ),
@@ -94,7 +129,18 @@ app.layout = html.Div(
                             children=[
                                 html.Div(id='countdown', className='countdown')
                             ]
-                        )
+                        ),
+                        html.Div(
+                            className='verdict-container',
+                            children=[
+                                html.Div(id='verdict', className='verdict'),
+                                dcc.Input(id='signature-label', type='text', placeholder='Fuel label'),
+                                html.Button('Save as Reference', id='save-signature', n_clicks=0, className="save"),
+                                html.Div(id='signature-status', className='signature-status'),
+                            ]
+                        ),
+                        html.Div(id='sensor-alerts', className='sensor-alerts'),
+                        html.Div(id='sensor-stats', className='sensor-stats')
                     ]
                 )
             ]
@@ -102,66 +148,108 @@ app.layout = html.Div(
     ]
 )
 
-data_for_graph = []
-colors = {}
-is_measuring = False
-
 @app.callback(
-    Output('live-graph', 'figure'),
-    [Input('graph-update', 'n_intervals'),
-     Input('start-button', 'n_clicks'),
-     Input('pause-button', 'n_clicks'),
-     Input('mode-dropdown', 'value'),
-     Input('device-dropdown', 'value')],
-    [State('countdown-container', 'style')]
+    [Output('mode-dropdown', 'options'),
+     Output('mode-dropdown', 'value'),
+     Output('graph-extend', 'disabled')],
+    [Input('url', 'pathname')]
 )
-def update_graph(n_intervals, start_clicks, pause_clicks, mode, device, current_style):
-    global data_for_graph, colors, is_measuring
+def load_settings(pathname):
+    """
+    Fills in the parts of the layout that come from the configuration when the page loads.
+    """
+    options = modes()
+    return options, options[0]['value'], push_updates()
 
-    ctx = dash.callback_context
+# Fraction of the run's grid points that must be covered by samples before a
+# window is classified or saved.
+MIN_COVERAGE = 0.95
+windows = {}
+_state = {}
+_state_lock = threading.Lock()
 
-    if not ctx.triggered:
-        button_id = 'No clicks yet'
-    else:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+def get_manager():
+    """
+    Returns the acquisition manager, started on first use together with the
+    signature library and the metrics reporter.
+    """
+    with _state_lock:
+        if 'manager' not in _state:
+            from utils import AcquisitionManager, SharedAcquisitionClient, SignatureLibrary
+
+            config = settings()
+            init.base.open()
+            if config.get('acquisition_process'):
+                # Devices are read by acquire.py; this process, or each of several workers, only reads shared memory.
+                manager = SharedAcquisitionClient(init.logger)
+            else:
+                manager = AcquisitionManager(init.logger, init.base)
+                init.base.start_compaction(config.get('cold_storage_age', 86400))
+            manager.start()
+            _state['library'] = SignatureLibrary(init.base)
+            reporter = metrics.MetricsReporter(init.logger)
+            reporter.start()
+            _state['manager'] = manager
+        return _state['manager']
+
+def get_library():
+    get_manager()
+    return _state['library']
+
+MAX_POINTS = 5000
+POINTS_PER_PIXEL = 2
+DEFAULT_GRAPH_WIDTH = 1200
+WIDTH_STEP = 100
 
-    if button_id == 'start-button' and not is_measuring:
-        is_measuring = True
-    elif button_id == 'pause-button' and is_measuring:
-        is_measuring = False
-
-    if is_measuring:
-        serial = SerialPortHandler(init.logger, device)
-        serial.open_serial_connection()
-
-        data_from_serial = serial.read_data()
-        protocol = ProtocolHandler(data_from_serial)
-        bin_arr = protocol.process()
-        values = list(map(ProtocolHandler.parse_elem, bin_arr))
-        
-        if (len(values) == len(list(zip(*data_for_graph)))) or (len(data_for_graph) == 0):
-            data_for_graph.append(values)
-
-    fig = sp.make_subplots(rows=4, cols=2, subplot_titles=[f'Sensor {i+1}' for i in range(len(values))])
-
-    max_values = []
-    min_values = []
-    for i, series in enumerate(zip(*data_for_graph)):
-        y_values = series
-        max_values.append(max(y_values))
-        min_values.append(min(y_values))
-        x_values = [i for i in range(series.__len__())]
-        if i not in colors:
-            colors[i] = f'rgb({random.randint(0, 255)}, {random.randint(0, 255)}, {random.randint(0, 255)})'
+# Figures shared by every session showing the same device, mode, width and data version.
+snapshots = SnapshotCache()
+feeds = {}
+
+def get_acquisition(device):
+    """
+    Returns the acquisition service of the selected device.
+    Devices selected before keep being read and recorded in the background.
+    """
+    return get_manager().service(device)
+
+def build_figure(service, mode, width=None):
+    """
+    Builds the whole subplot figure from the buffered samples.
+    Every series is downsampled to about POINTS_PER_PIXEL points per pixel of its subplot.
+    Plotly's figure classes are imported here, on the first figure.
+
+    Returns:
+        tuple: (figure, sequence) where sequence is the buffer version the figure shows.
+    """
+    import plotly.colors
+    import plotly.graph_objs as go
+    import plotly.subplots as sp
+    from utils.acquisition import DEFAULT_SENSORS
+
+    # One fixed colour per sensor, the same in every session.
+    palette = plotly.colors.qualitative.Plotly
+    n_sensors = DEFAULT_SENSORS
+    data_for_graph = np.empty((0, n_sensors))
+    sequence = 0
+    if service is not None:
+        n_sensors = service.n_sensors
+        _, data_for_graph, sequence = service.buffer.snapshot()
+    n_points = int((width or DEFAULT_GRAPH_WIDTH) / 2 * POINTS_PER_PIXEL)
+
+    fig = sp.make_subplots(rows=4, cols=2, subplot_titles=[f'Sensor {i+1}' for i in range(n_sensors)])
+
+    x_values = np.arange(sequence - len(data_for_graph), sequence)
+    for i in range(n_sensors):
         row = (i // 2) + 1
         col = (i % 2) + 1
+        x_points, y_points = downsample(x_values, data_for_graph[:, i], n_points)
         fig.add_trace(
             go.Scatter(
-                x=x_values,
-                y=y_values,
+                x=x_points,
+                y=y_points,
                 mode='lines',
                 name=f'Sensor {i+1}',
-                line=dict(color=colors[i]),
+                line=dict(color=palette[i % len(palette)]),
                 fill='tozeroy'
             ),
             row=row, col=col
@@ -176,14 +264,378 @@ def update_graph(n_intervals, start_clicks, pause_clicks, mode, device, current_
         margin=dict(l=50, r=50, b=50, t=80, pad=4),
         height=1000
     )
-    
-    for i in range(len(values)):
+
+    for i in range(n_sensors):
         row = (i // 2) + 1
         col = (i % 2) + 1
-        fig.update_xaxes(title_text='Time', range=[0, len(data_for_graph)], row=row, col=col, title_font=dict(size=11))
-        fig.update_yaxes(title_text='Value', range=[min_values[i], max_values[i]], row=row, col=col, title_font=dict(size=11))
+        fig.update_xaxes(title_text='Time', autorange=True, row=row, col=col, title_font=dict(size=11))
+        fig.update_yaxes(title_text='Value', autorange=True, row=row, col=col, title_font=dict(size=11))
+
+    return fig, sequence
+
+@app.callback(
+    Output('device-dropdown', 'options'),
+    [Input('graph-update', 'n_intervals')],
+    [State('device-dropdown', 'options')]
+)
+def update_devices(n_intervals, options):
+    """
+    Follows the devices plugged in or removed while the dashboard runs.
+    """
+    devices = sorted(get_manager().devices())
+    if [option['value'] for option in options or []] == devices:
+        return dash.no_update
+    return [{"label": device, "value": device} for device in devices]
+
+@app.callback(
+    [Output('start-button', 'disabled'),
+     Output('pause-button', 'disabled')],
+    [Input('start-button', 'n_clicks'),
+     Input('pause-button', 'n_clicks'),
+     Input('device-dropdown', 'value'),
+     Input('countdown-update', 'n_intervals')],
+    [State('mode-dropdown', 'value')]
+)
+def control_measurement(start_clicks, pause_clicks, device, n_intervals, mode):
+    """
+    Start runs a timed measurement of the selected mode followed by the purge phase.
+    The buttons follow the measurement state of the device, which is polled
+    because a run also ends by itself or, with a separate acquisition
+    process, is started there a moment after the click.
+    """
+    ctx = dash.callback_context
+
+    if not ctx.triggered:
+        button_id = 'No clicks yet'
+    else:
+        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+
+    service = get_acquisition(device)
+    if service is None:
+        return True, True
+    if button_id == 'start-button' and not service.is_measuring:
+        service.start_run(mode, settings()['timeout_under_measure'], settings().get('sample_rate', 10))
+        return True, False
+    if button_id == 'pause-button' and service.is_measuring:
+        service.pause()
+        return False, True
+    measuring = service.is_measuring
+    return measuring, not measuring
+
+app.clientside_callback(
+    """
+    function(mode) {
+        var graph = document.getElementById('live-graph');
+        return graph ? graph.offsetWidth : window.innerWidth;
+    }
+    """,
+    Output('graph-width', 'data'),
+    Input('mode-dropdown', 'value')
+)
+
+@app.callback(
+    [Output('live-graph', 'figure'),
+     Output('graph-sequence', 'data')],
+    [Input('mode-dropdown', 'value'),
+     Input('device-dropdown', 'value'),
+     Input('graph-width', 'data')]
+)
+def update_graph(mode, device, width):
+    """
+    Rebuilds the figure on the initial load and when the device or mode changes.
+    """
+    with metrics.callback_seconds.time():
+        snapshot = cached_figure(get_acquisition(device), device, mode, width)
+    return snapshot['figure'], {'device': device, 'sequence': snapshot['sequence']}
+
+def cached_figure(service, device, mode, width):
+    """
+    Returns the figure of the current data version from the snapshot cache,
+    building it on a miss. Widths are rounded up to WIDTH_STEP pixels so that
+    similar windows share a figure.
+
+    Returns:
+        dict: 'figure' (plotly dict), 'json' (serialized figure) and 'sequence'.
+    """
+    width = -(-int(width or DEFAULT_GRAPH_WIDTH) // WIDTH_STEP) * WIDTH_STEP
+    version = service.buffer.sequence if service is not None else 0
+
+    def build():
+        fig, sequence = build_figure(service, mode, width)
+        serialized = fig.to_json()
+        metrics.figure_bytes.observe(len(serialized))
+        return {'figure': fig.to_dict(), 'json': serialized, 'sequence': sequence}
+
+    return snapshots.get(('figure', device, mode, width, version), build)
+
+@app.server.route('/snapshot')
+def snapshot_endpoint():
+    """
+    The figure of a device as JSON, tagged with its data version. A request
+    whose If-None-Match holds the current tag gets 304 without any work.
+    """
+    device = flask.request.args.get('device')
+    mode = flask.request.args.get('mode', modes()[0]['value'], type=int)
+    width = flask.request.args.get('width', DEFAULT_GRAPH_WIDTH, type=int)
+    if device not in get_manager().devices():
+        return flask.Response(status=404)
+    service = get_acquisition(device)
+    etag = f'{mode}-{width}-{service.buffer.sequence}'
+    if flask.request.if_none_match.contains(etag):
+        response = flask.Response(status=304)
+    else:
+        snapshot = cached_figure(service, device, mode, width)
+        etag = f'{mode}-{width}-{snapshot["sequence"]}'
+        response = flask.Response(snapshot['json'], mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+@app.callback(
+    [Output('live-graph', 'extendData'),
+     Output('graph-sequence', 'data', allow_duplicate=True)],
+    [Input('graph-extend', 'n_intervals')],
+    [State('graph-sequence', 'data'),
+     State('device-dropdown', 'value')],
+    prevent_initial_call=True
+)
+def extend_graph(n_intervals, graph_sequence, device):
+    """
+    Sends only the samples written since the last update of this client.
+    """
+    with metrics.callback_seconds.time():
+        update = _new_samples(graph_sequence, device)
+    if update[0] is not dash.no_update:
+        metrics.figure_bytes.observe(len(json.dumps(update[0][0])))
+    return update
+
+def _new_samples(graph_sequence, device):
+    service = get_acquisition(device)
+    if service is None or not graph_sequence or graph_sequence['device'] != device:
+        return dash.no_update, dash.no_update
+
+    update, sequence = extend_data(service, graph_sequence['sequence'])
+    if update is None:
+        return dash.no_update, dash.no_update
+    return update, {'device': device, 'sequence': sequence}
+
+def extend_data(service, sequence):
+    """
+    Returns the extendData of the samples written after sequence, or None
+    if there are none, and the sequence to continue from.
+    """
+    x_values, y_values, sequence = _samples_since(service, sequence)
+    if not x_values:
+        return None, sequence
+
+    update = dict(
+        x=[x_values] * service.n_sensors,
+        y=y_values
+    )
+    return (update, list(range(service.n_sensors)), MAX_POINTS), sequence
+
+def _samples_since(service, sequence):
+    """
+    Returns the x values, the per-sensor y values and the sequence of the
+    samples written after sequence, at most MAX_POINTS of them.
+    """
+    _, values, sequence = service.buffer.since(sequence, MAX_POINTS)
+    x_values = np.arange(sequence - len(values), sequence).tolist()
+    return x_values, values.T.tolist(), sequence
+
+app.clientside_callback(
+    ClientsideFunction(namespace='stream', function_name='connect'),
+    Output('stream-state', 'data'),
+    Input('graph-sequence', 'data'),
+    State('graph-extend', 'disabled')
+)
+
+@app.server.route('/stream')
+def stream_endpoint():
+    """
+    Server-Sent Events with the samples of a device written after a sequence
+    number. The stream sleeps on the ring buffer until samples arrive, then
+    sends them at most every STREAM_INTERVAL seconds. An idle stream only
+    wakes to send a comment every STREAM_HEARTBEAT seconds.
+    """
+    device = flask.request.args.get('device')
+    sequence = flask.request.args.get('sequence', 0, type=int)
+    if device not in get_manager().devices():
+        return flask.Response(status=404)
+    return flask.Response(
+        flask.stream_with_context(_stream_events(device, sequence)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _stream_events(device, sequence):
+    while True:
+        service = get_acquisition(device)
+        if service is None:
+            return
+        payloads, sequence = delta_feed(device, service).read(sequence)
+        if payloads:
+            yield ''.join(f'data: {payload}\n\n' for payload in payloads)
+            # Samples arriving meanwhile go out together with the next event.
+            time.sleep(STREAM_INTERVAL)
+        elif not service.buffer.wait(sequence, STREAM_HEARTBEAT):
+            yield ': keep-alive\n\n'
+
+def delta_feed(device, service):
+    """
+    Returns the DeltaFeed of a device, so that every stream of the device
+    shares the serialized events.
+    """
+    feed = feeds.get(device)
+    if feed is None or feed.buffer is not service.buffer:
+        feed = feeds[device] = DeltaFeed(service.buffer, _encode_event, MAX_POINTS)
+    return feed
+
+def _encode_event(x_values, values, sequence):
+    payload = json.dumps({'sequence': sequence, 'x': x_values.tolist(), 'y': values.T.tolist(), 'max_points': MAX_POINTS})
+    metrics.figure_bytes.observe(len(payload))
+    return payload
+
+@app.callback(
+    Output('sensor-stats', 'children'),
+    [Input('graph-update', 'n_intervals')],
+    [State('device-dropdown', 'value')]
+)
+def update_stats(n_intervals, device):
+    """
+    Shows the streaming statistics of the selected device without touching its history.
+    """
+    service = get_acquisition(device)
+    if service is None or service.statistics.count == 0:
+        return None
+    stats = service.statistics.snapshot()
+    columns = ['mean', 'std', 'ewma', 'window_min', 'window_max']
+    header = html.Tr([html.Th('Sensor')] + [html.Th(column.replace('_', ' ')) for column in columns])
+    rows = [
+        html.Tr([html.Td(i + 1)] + [html.Td(f'{stats[column][i]:.0f}') for column in columns])
+        for i in range(service.n_sensors)
+    ]
+    return html.Table([header] + rows)
+
+@app.callback(
+    Output('sensor-alerts', 'children'),
+    [Input('graph-update', 'n_intervals')],
+    [State('device-dropdown', 'value')]
+)
+def update_alerts(n_intervals, device):
+    """
+    Lists the active sensor health conditions of the selected device, kept
+    up to date by the acquisition path itself.
+    """
+    service = get_acquisition(device)
+    if service is None:
+        return None
+    active = alerts(service.health.snapshot())
+    if not active:
+        return None
+    return [
+        html.Div(f'Sensor {sensor + 1}: {condition.replace("_", " ")} ({events} events)', className=f'alert {condition}')
+        for sensor, condition, events in active
+    ]
+
+def closed_window(service, mode):
+    """
+    Returns the features of the current run's measurement window once it is
+    complete, or None while it is still open or if samples cover less than
+    MIN_COVERAGE of it. Features are taken from the run's aligned sample grid
+    and computed once per run.
+    """
+    run = service.run if service is not None else None
+    if run is None or run.duration != mode or run.phase() not in (PURGING, DONE):
+        return None
+    key = (service.port_name, run.started)
+    if key in windows:
+        return windows[key]
+    timestamps, values, _ = service.buffer.snapshot()
+    grid, resampled = run.to_grid(timestamps, values)
+    covered = ~np.isnan(resampled).any(axis=1)
+    features = None
+    if covered.sum() >= 2 and covered.mean() >= MIN_COVERAGE:
+        features = extract_features(grid[covered], resampled[covered])
+    windows[key] = features
+    return features
+
+@app.callback(
+    Output('countdown', 'children'),
+    [Input('countdown-update', 'n_intervals')],
+    [State('device-dropdown', 'value')]
+)
+def update_countdown(n_intervals, device):
+    """
+    Shows the phase of the current run and the time left in it.
+    """
+    service = get_acquisition(device)
+    run = service.run if service is not None else None
+    if run is None:
+        return None
+    phase = run.phase()
+    if phase == MEASURING:
+        return f'Measuring: {run.remaining():.0f} s'
+    if phase == PURGING:
+        return f'Purging: {run.remaining():.0f} s'
+    if phase == ABORTED:
+        return 'Aborted'
+    return 'Done'
+
+@app.callback(
+    Output('verdict', 'children'),
+    [Input('graph-update', 'n_intervals')],
+    [State('device-dropdown', 'value'),
+     State('mode-dropdown', 'value')]
+)
+def update_verdict(n_intervals, device, mode):
+    """
+    Classifies the measurement window against the reference signatures as soon as it closes.
+    """
+    features = closed_window(get_acquisition(device), mode)
+    if features is None:
+        return None
+    match = get_library().classify(mode, features, k=3)[0]
+    if match is None:
+        return 'No reference signatures for this mode yet.'
+    label, distance = match
+    return f'Fuel: {label} (distance {distance:.2f})'
+
+@app.callback(
+    Output('signature-status', 'children'),
+    [Input('save-signature', 'n_clicks')],
+    [State('signature-label', 'value'),
+     State('device-dropdown', 'value'),
+     State('mode-dropdown', 'value')],
+    prevent_initial_call=True
+)
+def save_signature(n_clicks, label, device, mode):
+    """
+    Stores the last closed measurement window as a labelled reference.
+    """
+    service = get_acquisition(device)
+    features = closed_window(service, mode)
+    if not label:
+        return 'Enter a label first.'
+    if features is None:
+        run = service.run if service is not None else None
+        phase = run.phase() if run is not None and run.duration == mode else None
+        if phase == ABORTED:
+            return 'The measurement was aborted, start a new one.'
+        if phase in (PURGING, DONE):
+            return 'The measurement window is incomplete, start a new one.'
+        return 'Wait for the measurement window to close.'
+    get_library().add(label, mode, features)
+    return f'Saved reference "{label}".'
 
-    return fig
+@app.server.route('/metrics')
+def metrics_endpoint():
+    """
+    Hot-path metrics in the Prometheus text format. With acquisition_process,
+    the metrics of the acquisition process are added to those of this one.
+    """
+    manager = get_manager()
+    others = [manager.metrics()] if settings().get('acquisition_process') else []
+    return flask.Response(metrics.registry.render(others), mimetype='text/plain; version=0.0.4')
 
 if __name__ == "__main__":
-    app.run_server(debug=True, host='127.0.0.1', port=8056)
\ No newline at end of file
+    app.run(debug=True, host='127.0.0.1', port=8056)
\ No newline at end of file
@@ -0,0 +1,82 @@
+// Live graph updates pushed by the /stream route of app.py.
+// Samples arriving between two frames are merged and drawn with a single
+// Plotly.extendTraces call per animation frame.
+
+(function () {
+    var source = null;
+    var stream = {device: null, sequence: 0};
+    var pending = null;
+    var maxPoints = 5000;
+    var frameRequested = false;
+    var reconnectTimer = null;
+
+    function graphDiv() {
+        var container = document.getElementById('live-graph');
+        return container ? container.getElementsByClassName('js-plotly-plot')[0] : null;
+    }
+
+    function draw() {
+        frameRequested = false;
+        var graph = graphDiv();
+        if (!pending || !graph || !window.Plotly) {
+            return;
+        }
+        var indices = pending.y.map(function (_, i) { return i; });
+        var x = pending.y.map(function () { return pending.x; });
+        window.Plotly.extendTraces(graph, {x: x, y: pending.y}, indices, maxPoints);
+        pending = null;
+    }
+
+    function receive(event) {
+        var data = JSON.parse(event.data);
+        stream.sequence = data.sequence;
+        maxPoints = data.max_points;
+        if (pending === null) {
+            pending = {x: data.x, y: data.y};
+        } else {
+            // A hidden tab gets no animation frames; keep no more than the graph shows.
+            pending.x = pending.x.concat(data.x).slice(-maxPoints);
+            pending.y = pending.y.map(function (values, i) {
+                return values.concat(data.y[i]).slice(-maxPoints);
+            });
+        }
+        if (!frameRequested) {
+            frameRequested = true;
+            window.requestAnimationFrame(draw);
+        }
+    }
+
+    function open() {
+        clearTimeout(reconnectTimer);
+        if (source !== null) {
+            source.close();
+            source = null;
+        }
+        if (!stream.device) {
+            return;
+        }
+        var url = '/stream?device=' + encodeURIComponent(stream.device) + '&sequence=' + stream.sequence;
+        source = new EventSource(url);
+        source.onmessage = receive;
+        source.onerror = function () {
+            // Reconnect from the last sequence received, not from the one in the URL.
+            source.close();
+            source = null;
+            reconnectTimer = setTimeout(open, 1000);
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        stream: {
+            connect: function (graphSequence, pushMode) {
+                // A new figure was drawn from graphSequence.sequence: stream from there on.
+                // pushMode is true when the graph-extend polling is disabled.
+                pending = null;
+                stream.device = graphSequence && pushMode ? graphSequence.device : null;
+                stream.sequence = graphSequence ? graphSequence.sequence : 0;
+                open();
+                return stream.device;
+            }
+        }
+    });
+})();
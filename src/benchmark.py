@@ -0,0 +1,69 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+from benchmarks import dashboard, decode, startup, storage
+
+SUITES = {
+    'decode': decode.run,
+    'storage': storage.run,
+    'dashboard': dashboard.run,
+    'startup': startup.run,
+}
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the results that got worse than the baseline by more than tolerance.
+    """
+    previous = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline['results']}
+    regressions = []
+    for current in results:
+        old = previous.get((current['name'], json.dumps(current['params'], sort_keys=True)))
+        if old is None or not old['value']:
+            continue
+        change = (current['value'] - old['value']) / old['value']
+        if current['better'] == 'lower':
+            change = -change
+        if change < -tolerance:
+            regressions.append({**current, 'baseline': old['value'], 'change': change})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the decode, storage and dashboard hot paths and of the startup.')
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help=f'suites to run: {", ".join(SUITES)} (default: all)')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown reported as a regression (default: 0.2)')
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f'unknown suite: {", ".join(sorted(unknown))}')
+
+    results = []
+    for name in args.suites or SUITES:
+        results.extend(SUITES[name]())
+
+    report = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['regressions'] = compare(results, json.load(file), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    return 1 if report.get('regressions') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
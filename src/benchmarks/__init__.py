@@ -0,0 +1,28 @@
+# src/benchmarks/__init__.py
+
+import time
+
+def best_time(func, repeat=5, number=1):
+    """
+    Returns the best time in seconds of number calls of func, out of repeat runs.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+def result(name, value, unit, better='higher', **params):
+    """
+    Builds one benchmark result record.
+
+    Args:
+        name (str): The measured path.
+        value (float): The measured value.
+        unit (str): The unit of value.
+        better (str): 'higher' or 'lower', used to detect regressions.
+        params: The parameters the value was measured with.
+    """
+    return {'name': name, 'params': params, 'value': value, 'unit': unit, 'better': better}
@@ -0,0 +1,45 @@
+import json
+import logging
+import time
+
+from utils import AcquisitionService, VirtualSensorDevice
+
+from . import best_time, result
+
+def run(history_sizes=(10, 1000, 100000), repeat=3):
+    # Imported here: the dashboard module builds the Dash app on import.
+    import app
+
+    results = []
+    mode = app.modes()[0]['value']
+    device = VirtualSensorDevice(seed=0)
+    for size in history_sizes:
+        # Services of our own: app.get_acquisition() would start the dashboard's
+        # manager, scan the serial ports and create tables in data/data.db.
+        url = f'nose://synthetic?seed={size}'
+        service = AcquisitionService(logging.getLogger('benchmark'), url)
+        service.buffer.extend(range(size), device.samples(size))
+
+        def build():
+            # A new sample is a new data version: every call builds the figure.
+            service.buffer.extend([time.time()], device.samples(1))
+            return app.cached_figure(service, url, mode, None)
+
+        elapsed = best_time(build, repeat)
+        payload = len(build()['json'])
+        results.append(result('dashboard.update_graph', elapsed * 1000, 'ms', 'lower', points=size))
+        results.append(result('dashboard.update_graph_payload', payload, 'bytes', 'lower', points=size))
+        elapsed = best_time(lambda: app.cached_figure(service, url, mode, None), repeat)
+        results.append(result('dashboard.update_graph_cached', elapsed * 1000, 'ms', 'lower', points=size))
+
+        state = {'sequence': service.buffer.sequence, 'payload': 0}
+
+        def extend():
+            service.buffer.extend([time.time()], device.samples(1))
+            update, state['sequence'] = app.extend_data(service, state['sequence'])
+            state['payload'] = len(json.dumps(update[0]))
+
+        elapsed = best_time(extend, repeat)
+        results.append(result('dashboard.extend_graph', elapsed * 1000, 'ms', 'lower', points=size))
+        results.append(result('dashboard.extend_graph_payload', state['payload'], 'bytes', 'lower', points=size))
+    return results
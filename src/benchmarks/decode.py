@@ -0,0 +1,44 @@
+from utils import FrameParser, ProtocolHandler, VirtualSensorDevice
+
+from . import best_time, result
+
+FRAME_SIZE = 32
+
+def synthetic_stream(frames, corruption=0.0):
+    """
+    Returns frames of synthetic sensor data as one byte string.
+    """
+    return VirtualSensorDevice(rate=100, corruption=corruption, seed=0).frames(frames)
+
+def run(frames=20000, repeat=3):
+    stream = synthetic_stream(frames)
+    chunks = [stream[i:i + FRAME_SIZE] for i in range(0, len(stream), FRAME_SIZE)]
+
+    def per_frame():
+        for chunk in chunks:
+            bin_arr = ProtocolHandler(chunk).process()
+            list(map(ProtocolHandler.parse_num, bin_arr))
+            list(map(ProtocolHandler.parse_elem, bin_arr))
+
+    def batch():
+        ProtocolHandler.decode_frames(stream)
+
+    def streaming(chunk_size):
+        def feed():
+            parser = FrameParser()
+            for i in range(0, len(stream), chunk_size):
+                parser.feed_batch(stream[i:i + chunk_size])
+        return feed
+
+    results = [
+        result('decode.process_parse', frames / best_time(per_frame, repeat), 'frames/s', frames=frames),
+        result('decode.decode_frames', frames / best_time(batch, repeat), 'frames/s', frames=frames),
+    ]
+    for chunk_size in (32, 4096):
+        elapsed = best_time(streaming(chunk_size), repeat)
+        results.append(result('decode.frame_parser', frames / elapsed, 'frames/s', frames=frames, chunk_size=chunk_size))
+
+    corrupted = synthetic_stream(frames, corruption=0.01)
+    elapsed = best_time(lambda: FrameParser().feed_batch(corrupted), repeat)
+    results.append(result('decode.frame_parser', frames / elapsed, 'frames/s', frames=frames, corruption=0.01))
+    return results
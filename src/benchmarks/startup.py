@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from . import result
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter with python -X importtime.
+
+    Returns:
+        list: (name, depth, self seconds, cumulative seconds) per imported module,
+        in the order the interpreter reports them. Depth 0 is module itself.
+    """
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [SOURCE_DIR, environment.get('PYTHONPATH')]))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(SOURCE_DIR), env=environment, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'import {module} failed: {completed.stderr.strip().splitlines()[-1]}')
+
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append((name.strip(), depth, int(own) / 1e6, int(cumulative) / 1e6))
+    return times
+
+def total_time(times, module):
+    return next(cumulative for name, depth, _, cumulative in times if name == module and depth == 0)
+
+def run(module='app', repeat=3):
+    best = min(total_time(import_times(module), module) for _ in range(repeat))
+    return [result('startup.import', best, 's', 'lower', module=module)]
@@ -0,0 +1,70 @@
+import logging
+import os
+import tempfile
+
+from utils import DataBase, VirtualSensorDevice
+
+from . import best_time, result
+
+N_SENSORS = 8
+
+def open_database(folder, name, rollups=True):
+    base = DataBase(logging.getLogger('benchmark'), os.path.join(folder, name))
+    base.open()
+    base.create_table('samples', N_SENSORS, rollups)
+    return base
+
+def file_bytes(base):
+    base.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(base.db_name)
+
+def sample_rows(count):
+    values = VirtualSensorDevice(n_sensors=N_SENSORS, seed=0).samples(count).tolist()
+    return [(i, *row) for i, row in enumerate(values)]
+
+def run(write_rows=2000, table_sizes=(1000, 10000, 100000), repeat=3):
+    results = []
+    rows = sample_rows(write_rows)
+    with tempfile.TemporaryDirectory() as folder:
+        base = open_database(folder, 'write_data.db')
+        elapsed = best_time(lambda: [base.write_data('samples', list(row[1:]), row[0]) for row in rows], repeat)
+        results.append(result('storage.write_data', write_rows / elapsed, 'rows/s', rows=write_rows))
+        base.close()
+
+        base = open_database(folder, 'write_many.db')
+        elapsed = best_time(lambda: base.write_many('samples', rows), repeat)
+        results.append(result('storage.write_many', write_rows / elapsed, 'rows/s', rows=write_rows))
+        base.close()
+
+        base = open_database(folder, 'writer.db')
+        base.start_writer()
+
+        def queued():
+            for row in rows:
+                base.write_data('samples', list(row[1:]), row[0])
+            base.flush()
+
+        elapsed = best_time(queued, repeat)
+        results.append(result('storage.batch_writer', write_rows / elapsed, 'rows/s', rows=write_rows))
+        base.stop_writer()
+        base.close()
+
+        for size in table_sizes:
+            base = open_database(folder, f'read_{size}.db')
+            base.write_many('samples', sample_rows(size))
+            elapsed = best_time(lambda: base.read_data('samples'), repeat)
+            results.append(result('storage.read_data', size / elapsed, 'rows/s', rows=size))
+            elapsed = best_time(lambda: base.query_range_arrays('samples', size // 2), repeat)
+            results.append(result('storage.query_range_arrays', (size - size // 2) / elapsed, 'rows/s', rows=size))
+            base.close()
+
+            # Without rollups, which compaction keeps, so that the ratio is the one of the samples.
+            base = open_database(folder, f'compact_{size}.db', rollups=False)
+            base.write_many('samples', sample_rows(size))
+            raw_bytes = file_bytes(base)
+            base.compact('samples', size)
+            elapsed = best_time(lambda: base.query_range_arrays('samples', size // 2), repeat)
+            results.append(result('storage.compressed_range_arrays', (size - size // 2) / elapsed, 'rows/s', rows=size))
+            results.append(result('storage.compression_ratio', raw_bytes / file_bytes(base), 'x', rows=size))
+            base.close()
+    return results
@@ -0,0 +1,26 @@
+import argparse
+import sys
+
+from benchmarks.startup import import_times, total_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks the cold-start import time against a budget.')
+    parser.add_argument('--module', default='app', help='module to import (default: app)')
+    parser.add_argument('--budget', type=float, default=1.0, help='allowed import time in seconds (default: 1.0)')
+    parser.add_argument('--repeat', type=int, default=3, help='imports measured, the best counts (default: 3)')
+    parser.add_argument('--top', type=int, default=10, help='slowest direct imports listed (default: 10)')
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    times = min(runs, key=lambda times: total_time(times, args.module))
+    total = total_time(times, args.module)
+
+    direct = sorted((entry for entry in times if entry[1] == 1), key=lambda entry: entry[3], reverse=True)
+    for name, _, _, cumulative in direct[:args.top]:
+        print(f'{cumulative * 1000:8.1f} ms  {name}')
+    verdict = 'within' if total <= args.budget else 'over'
+    print(f'import {args.module}: {total * 1000:.1f} ms, {verdict} the budget of {args.budget * 1000:.0f} ms')
+    return 0 if total <= args.budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
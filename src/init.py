@@ -1,12 +1,40 @@
-from utils import ConfigurationTool
-from utils import Logger
-from utils import DataBase
+import threading
 
-logger = Logger('log', 'logs/log_file.log')
+# logger, config and base are created on first use, e.g. init.base, so that
+# importing this module reads no file and opens no database.
 
-config = ConfigurationTool(logger, 'config/config.yaml')
-config.ensure_config()
+_lock = threading.RLock()
 
-base = DataBase(logger,'data/data.db')
-base.ensure_database()
+def _logger():
+    from utils import Logger
+    return Logger('log', 'logs/log_file.log', queued=True, max_bytes=5 * 1024 * 1024, dedup_interval=60)
 
+def _config():
+    from utils import ConfigurationTool, PortScanner
+    config = ConfigurationTool(__getattr__('logger'), 'config/config.yaml')
+    config.ensure_config()
+
+    for url in config.read().get('virtual_devices') or []:
+        PortScanner.register_virtual_port(url)
+    return config
+
+def _base():
+    from utils import DataBase
+    base = DataBase(__getattr__('logger'), 'data/data.db')
+    base.ensure_database()
+    return base
+
+_FACTORIES = {
+    'logger': _logger,
+    'config': _config,
+    'base': _base,
+}
+
+def __getattr__(name):
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    with _lock:
+        if name not in globals():
+            globals()[name] = factory()
+        return globals()[name]
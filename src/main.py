@@ -1,29 +1,165 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+import numpy as np
+import serial
+
 import init
 from utils import PortScanner, SerialPortHandler
-from utils import ProtocolHandler
+from utils import FrameParser
+from utils import DataBase, SessionArchiveWriter, StreamingStatistics
+from utils import auxiliary_modules as am
+from utils.acquisition import AcquisitionManager, DEFAULT_SENSORS
+
+DATABASE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+class Recorder:
+    """
+    Records one device without the dashboard: large reads, decoding in
+    batches and batched writes to a SQLite table or a session archive. The
+    stats line summarizes the samples with a StreamingStatistics.
+    """
+
+    def __init__(self, port_name, output, mode, n_sensors=DEFAULT_SENSORS, chunk_size=65536, baud_rate=57600):
+        self.port_name = port_name
+        self.output = output
+        self.mode = mode
+        self.n_sensors = n_sensors
+        self.chunk_size = chunk_size
+        self.parser = FrameParser(n_sensors)
+        self.statistics = StreamingStatistics(n_sensors)
+        self.samples = 0
+        self.stopping = threading.Event()
+        self._serial = SerialPortHandler(init.logger, port_name, baud_rate)
+        self._base = None
+        self._archive = None
+        self._table_name = None
+
+    def open(self):
+        if self.output.endswith(DATABASE_EXTENSIONS):
+            self._base = DataBase(init.logger, self.output)
+            self._base.open()
+            self._table_name = AcquisitionManager.table_name(self.port_name)
+            self._base.create_table(self._table_name, self.n_sensors)
+            self._base.start_writer()
+        else:
+            self._archive = SessionArchiveWriter(self.output, self.n_sensors, self.mode)
+        self._serial.open_serial_connection()
+
+    def close(self):
+        """
+        Flushes every pending sample and closes the port and the output.
+        """
+        self._serial.close_serial_connection()
+        if self._base is not None:
+            self._base.stop_writer()
+            self._base.close()
+        if self._archive is not None:
+            self._archive.close()
+
+    def run(self, duration=None, stats_interval=5.0):
+        """
+        Records until stop() is called or duration seconds have passed.
+        """
+        started = time.monotonic()
+        last_read = None
+        last_report = started
+        reported_samples = 0
+        while not self.stopping.is_set():
+            now = time.monotonic()
+            if duration is not None and now - started >= duration:
+                break
+            if now - last_report >= stats_interval:
+                print(self.stats_line((self.samples - reported_samples) / (now - last_report)), flush=True)
+                last_report, reported_samples = now, self.samples
+
+            data = self._serial.read_available(self.chunk_size)
+            if not data:
+                continue
+            timestamp = am.precise_timestamp()
+            values = self.parser.feed_batch(data)
+            if len(values) == 0:
+                continue
+            timestamps = am.spread_timestamps(last_read, timestamp, len(values))
+            last_read = timestamp
+            self._write(timestamps, values)
+            self.statistics.update(values)
+            self.samples += len(values)
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats_line(self, rate):
+        line = (f'{rate:.0f} samples/s, {self.samples} samples, {self.parser.resyncs} resyncs, '
+                f'{self.parser.discarded_bytes} bytes dropped')
+        if self._base is not None:
+            line += f', queue {self._base.writer_stats()["queue_depth"]}'
+        snapshot = self.statistics.snapshot()
+        if snapshot['count']:
+            sensors = zip(snapshot['mean'], snapshot['window_min'], snapshot['window_max'])
+            line += ' | mean [window min..max]: ' + ', '.join(
+                f'{sensor}: {mean:.0f} [{low:.0f}..{high:.0f}]' for sensor, (mean, low, high) in enumerate(sensors, 1)
+            )
+        return line
+
+    def _write(self, timestamps, values):
+        if self._archive is not None:
+            self._archive.append(timestamps, values)
+        else:
+            self._base.write_many(self._table_name, np.column_stack((timestamps, values)).tolist())
 
-available_ports = PortScanner.port_list()
-print(available_ports)
+def main():
+    config = init.config.read()
+    modes = list(config['measurement_modes'].values())
+    parser = argparse.ArgumentParser(description='Records a sensor device to SQLite or a session archive.')
+    parser.add_argument('port', nargs='?', help='serial port or nose:// URL; omit to list the ports')
+    parser.add_argument('--mode', type=int, default=modes[0],
+                        help=f'measurement mode in seconds, stored in archives (default: {modes[0]})')
+    parser.add_argument('--output', default='data/data.db',
+                        help='a .db/.sqlite file, or any other path for a session archive (default: data/data.db)')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds (default: until interrupted)')
+    parser.add_argument('--sensors', type=int, default=DEFAULT_SENSORS, help='channels per frame')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='maximum bytes per read')
+    parser.add_argument('--stats-interval', type=float, default=5.0, help='seconds between two stats lines')
+    args = parser.parse_args()
 
-actual_port = input('>:')
+    if args.port is None:
+        for port_name in PortScanner.port_list():
+            print(port_name)
+        return 0
 
-serial = SerialPortHandler(init.logger, actual_port)
-serial.open_serial_connection()
+    folder = os.path.dirname(args.output)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
 
+    recorder = Recorder(args.port, args.output, args.mode, args.sensors, args.chunk_size)
+    signal.signal(signal.SIGINT, lambda signum, frame: recorder.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: recorder.stop())
 
-try:
-    while True:
-        try:
-            data = serial.read_data()
-            protocol = ProtocolHandler(data)
-            bin_arr = protocol.process()
-            values = list(map(ProtocolHandler.parse_elem, bin_arr))
-            numbers = list(map(ProtocolHandler.parse_num, bin_arr))
-            print(list(zip(numbers, values)))
-        except:
-            continue
-    serial.close_serial_connection()
-except Exception as e:
-    print(str(e))
-    serial.close_serial_connection()
+    started = time.monotonic()
+    status = 0
+    try:
+        recorder.open()
+        init.logger.info(f'Recording {args.port} to {args.output}.')
+        recorder.run(args.duration, args.stats_interval)
+    except serial.SerialException as e:
+        init.logger.error(f'Error reading serial port {args.port}: {e}')
+        print(f'Error reading serial port {args.port}: {e}', file=sys.stderr)
+        status = 1
+    except ValueError as e:
+        init.logger.error(f'Error opening {args.output}: {e}')
+        print(f'Error opening {args.output}: {e}', file=sys.stderr)
+        status = 1
+    finally:
+        recorder.close()
+    elapsed = time.monotonic() - started
+    print(recorder.stats_line(recorder.samples / elapsed if elapsed else 0.0), flush=True)
+    init.logger.info(f'Recorded {recorder.samples} samples of {args.port} to {args.output}.')
+    return status
 
+if __name__ == "__main__":
+    sys.exit(main())
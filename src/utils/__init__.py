@@ -1,7 +1,40 @@
 # src/utils/__init__.py
 
-from .config_tools import ConfigurationTool
-from .database import DataBase
-from .logger import Logger
-from .protocol import ProtocolHandler
-from .serial_module import SerialPortHandler, PortScanner
+import importlib
+
+# Names are imported from their submodule on first use, so that importing utils
+# does not load NumPy, pyserial, SQLite and YAML before anything needs them.
+_EXPORTS = {
+    'ConfigurationTool': 'config_tools',
+    'DataBase': 'database',
+    'Logger': 'logger',
+    'ProtocolHandler': 'protocol',
+    'FrameParser': 'protocol',
+    'SerialPortHandler': 'serial_module',
+    'PortScanner': 'serial_module',
+    'RingBuffer': 'ring_buffer',
+    'SharedRingBuffer': 'ring_buffer',
+    'AcquisitionService': 'acquisition',
+    'AcquisitionManager': 'acquisition',
+    'SessionArchive': 'archive',
+    'SessionArchiveWriter': 'archive',
+    'VirtualSensorDevice': 'virtual_device',
+    'ReplayDevice': 'virtual_device',
+    'StreamingStatistics': 'statistics',
+    'SensorHealth': 'health',
+    'SignatureLibrary': 'signatures',
+    'extract_features': 'signatures',
+    'MeasurementScheduler': 'scheduler',
+    'AcquisitionPublisher': 'shared_acquisition',
+    'SharedAcquisitionClient': 'shared_acquisition',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
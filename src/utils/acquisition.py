@@ -0,0 +1,373 @@
+import hashlib
+import re
+import threading
+
+import numpy as np
+import serial
+
+from . import auxiliary_modules as am
+from . import metrics
+from .health import SensorHealth
+from .protocol import FrameParser
+from .ring_buffer import RingBuffer, SharedRingBuffer
+from .scheduler import MeasurementScheduler, DONE
+from .statistics import StreamingStatistics
+from .serial_module import SerialPortHandler, PortScanner
+
+DEFAULT_SENSORS = 8
+DEFAULT_CAPACITY = 100_000
+
+def shared_segment_name(port_name, kind):
+    """
+    Returns the shared memory segment name of a device, short enough for every platform.
+    """
+    digest = hashlib.blake2s(port_name.encode(), digest_size=6).hexdigest()
+    return f'smartnose_{digest}_{kind}'
+
+class AcquisitionService:
+    """
+    Reads a serial device continuously on a dedicated thread.
+
+    The port is opened once and decoded samples are pushed into a RingBuffer.
+    Consumers such as the dashboard only take snapshots from the buffer.
+    Every batch also goes through the streaming statistics and the
+    SensorHealth checks, whose alerts are logged and counted.
+    """
+
+    def __init__(self, logger, port_name, n_sensors=DEFAULT_SENSORS, capacity=DEFAULT_CAPACITY, baud_rate=57600,
+                 buffer=None):
+        """
+        Initialize the AcquisitionService.
+
+        Args:
+            port_name (str): The name of the COM port.
+            n_sensors (int): The number of channels in one frame.
+            capacity (int): The number of samples kept in the ring buffer.
+            baud_rate (int): The baud rate for serial communication.
+            buffer (RingBuffer, optional): The buffer to push into, e.g. a SharedRingBuffer.
+        """
+        self.port_name = port_name
+        self.n_sensors = n_sensors
+        self.buffer = buffer if buffer is not None else RingBuffer(capacity, n_sensors)
+        self.parser = FrameParser(n_sensors)
+        self.statistics = StreamingStatistics(n_sensors)
+        self.health = SensorHealth(n_sensors)
+        self.__logger = logger
+        self._serial = SerialPortHandler(logger, port_name, baud_rate)
+        self._measuring = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._sinks = []
+        # Held by the reader while it decodes a batch and by the resets of the
+        # parser, statistics and health; _generation drops reads that straddle one.
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.started = False
+        self.run_started = None
+        self.run = None
+        self._last_read = None
+
+    @property
+    def is_measuring(self):
+        return self._measuring.is_set()
+
+    @property
+    def is_alive(self):
+        """
+        True while the reader thread runs. It ends on stop() or when the port fails.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_sink(self, sink):
+        """
+        Registers a callable that receives (timestamps, values) of every decoded
+        batch. Sinks run on the reader thread and must not block.
+        """
+        self._sinks.append(sink)
+
+    def start(self):
+        """
+        Starts or resumes the measurement. The port is opened on the first call only.
+
+        Returns:
+            bool: True if the device is being read.
+        """
+        return self._start()
+
+    def _start(self, run=None):
+        if not self._serial.is_open():
+            try:
+                self._serial.open_serial_connection()
+            except serial.SerialException as e:
+                self.__logger.error(f'Error opening serial port {self.port_name}: {e}')
+                return False
+            if not self._serial.is_open():
+                return False
+            already_open = False
+        else:
+            already_open = True
+
+        with self._lock:
+            self._generation += 1
+            if already_open:
+                self._serial.reset_input_buffer()
+                self.parser.reset()
+            if run is not None:
+                # Everything is in place before the reader sees _measuring.
+                self.run = run
+                run.start()
+                self.run_started = run.started
+                self.statistics.reset()
+                self.health.reset()
+            elif not self._measuring.is_set():
+                self.run_started = am.precise_timestamp()
+
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=f'acquisition-{self.port_name}', daemon=True)
+            self._thread.start()
+        self.started = True
+        self._measuring.set()
+        return True
+
+    def start_run(self, duration, purge, rate=10.0):
+        """
+        Starts a timed run: the measurement window, then the purge phase,
+        after which the measurement stops by itself.
+
+        Returns:
+            bool: True if the device is being read.
+        """
+        self.pause()
+        return self._start(MeasurementScheduler(duration, purge, rate))
+
+    def pause(self):
+        """
+        Pauses the measurement and ends the current run. The port stays open.
+        """
+        self._measuring.clear()
+        if self.run is not None:
+            self.run.stop()
+        with self._lock:
+            self._generation += 1
+            self._last_read = None
+
+    def stop(self):
+        """
+        Stops the reader thread and closes the port.
+        """
+        self._measuring.clear()
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._serial.close_serial_connection()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self._measuring.wait(timeout=0.1):
+                continue
+            if self.run is not None and self.run.phase() == DONE:
+                self.pause()
+                continue
+            generation = self._generation
+            try:
+                with metrics.serial_read_seconds.time():
+                    data = self._serial.read_available()
+            except serial.SerialException as e:
+                self.__logger.error(f'Error reading serial port {self.port_name}: {e}')
+                self._measuring.clear()
+                self._serial.close_serial_connection()
+                break
+            if not data:
+                continue
+            metrics.serial_bytes.inc(len(data))
+            with self._lock:
+                if generation == self._generation:
+                    self._push(am.precise_timestamp(), data)
+
+    def _push(self, timestamp, data):
+        resyncs, discarded = self.parser.resyncs, self.parser.discarded_bytes
+        missing, out_of_sequence = self.parser.missing_channels.copy(), self.parser.out_of_sequence.copy()
+        values = self.parser.feed_batch(data)
+        metrics.frames_decoded.inc(len(values))
+        metrics.parser_resyncs.inc(self.parser.resyncs - resyncs)
+        metrics.parser_discarded_bytes.inc(self.parser.discarded_bytes - discarded)
+        alerts = self.health.update(values, self.parser.missing_channels - missing,
+                                    self.parser.out_of_sequence - out_of_sequence)
+        for sensor, condition in alerts:
+            self.__logger.warning(f'Sensor {sensor + 1} of {self.port_name}: {condition.replace("_", " ")}.')
+        metrics.sensor_alerts.inc(len(alerts))
+        previous, self._last_read = self._last_read, timestamp
+        if len(values):
+            timestamps = am.spread_timestamps(previous, timestamp, len(values))
+            self.buffer.extend(timestamps, values)
+            self.statistics.update(values)
+            for sink in self._sinks:
+                sink(timestamps, values)
+
+class AcquisitionManager:
+    """
+    Reads several devices at the same time, one AcquisitionService and reader
+    thread per port.
+
+    Ports come from PortScanner.port_list() or from an allow-list and are
+    rescanned periodically, so hot-plugged devices are picked up and unplugged
+    ones released. Every device has its own parser state, ring buffer and,
+    when a DataBase is given, its own table.
+
+    With shared=True every ring buffer is a SharedRingBuffer named after its
+    port (see shared_segment_name), readable from other processes.
+    """
+
+    def __init__(self, logger, base=None, allow_list=None, auto_start=False, scan_interval=2.0,
+                 n_sensors=DEFAULT_SENSORS, capacity=DEFAULT_CAPACITY, shared=False):
+        """
+        Initialize the AcquisitionManager.
+
+        Args:
+            base (DataBase, optional): Database the samples are written to.
+            allow_list (list, optional): Only these ports are used.
+            auto_start (bool): Start measuring every discovered port right away.
+            scan_interval (float): Seconds between two port scans.
+            n_sensors (int): The number of channels in one frame.
+            capacity (int): The number of samples kept per device.
+            shared (bool): Keep the ring buffers in shared memory.
+        """
+        self.base = base
+        self.allow_list = allow_list
+        self.auto_start = auto_start
+        self.scan_interval = scan_interval
+        self.n_sensors = n_sensors
+        self.capacity = capacity
+        self.shared = shared
+        self.__logger = logger
+        self._services = {}
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._scanner = None
+
+    @staticmethod
+    def table_name(port_name):
+        """
+        Returns the table of a device, e.g. '/dev/ttyUSB0' -> 'device_dev_ttyUSB0'.
+        """
+        return 'device_' + re.sub(r'\W+', '_', port_name).strip('_')
+
+    def start(self):
+        """
+        Scans the ports on a background thread, right away and then every
+        scan_interval seconds, so that a slow port enumeration does not hold
+        up the caller.
+        """
+        if self.base is not None:
+            self.base.start_writer()
+        if self._scanner is None:
+            self._stopping.clear()
+            self._scanner = threading.Thread(target=self._scan_loop, name='acquisition-scanner', daemon=True)
+            self._scanner.start()
+
+    def stop(self):
+        """
+        Stops scanning and every device, then flushes the database writer.
+        """
+        self._stopping.set()
+        if self._scanner is not None:
+            self._scanner.join()
+            self._scanner = None
+        with self._lock:
+            services, self._services = list(self._services.values()), {}
+        for service in services:
+            self._release(service)
+        if self.base is not None:
+            self.base.stop_writer()
+
+    def devices(self):
+        """
+        Returns the ports currently known to the manager.
+        """
+        with self._lock:
+            return list(self._services)
+
+    def services(self):
+        """
+        Returns the current services by port, without creating any.
+        """
+        with self._lock:
+            return dict(self._services)
+
+    def service(self, port_name):
+        """
+        Returns the service of a port, creating it if needed. A URL port
+        requested here, e.g. a virtual device, is kept even though the scan
+        does not list it; a serial port is released once it disappears.
+        """
+        if not port_name:
+            return None
+        with self._lock:
+            if '://' in port_name:
+                self._requested.add(port_name)
+            service = self._services.get(port_name)
+            if service is None:
+                service = self._create(port_name)
+            return service
+
+    def scan(self):
+        """
+        Adds the new ports and releases the services whose port disappeared or failed.
+        """
+        available = PortScanner.port_list()
+        if self.allow_list is not None:
+            allowed = set(self.allow_list)
+            available = [port for port in available if port in allowed]
+            available += [port for port in self.allow_list if '://' in port and port not in available]
+
+        released = []
+        with self._lock:
+            for port_name, service in list(self._services.items()):
+                failed = service.started and not service.is_alive
+                missing = port_name not in available and port_name not in self._requested
+                if missing or failed:
+                    released.append(self._services.pop(port_name))
+            for port_name in available:
+                if port_name not in self._services:
+                    service = self._create(port_name)
+                    if self.auto_start:
+                        service.start()
+        for service in released:
+            self.__logger.info(f'Device {service.port_name} released.')
+            self._release(service)
+
+    def _create(self, port_name):
+        buffer = None
+        if self.shared:
+            buffer = SharedRingBuffer(shared_segment_name(port_name, 'ring'), self.capacity, self.n_sensors, create=True)
+        service = AcquisitionService(self.__logger, port_name, self.n_sensors, self.capacity, buffer=buffer)
+        if self.base is not None:
+            table_name = self.table_name(port_name)
+            self.base.create_table(table_name, self.n_sensors)
+            service.add_sink(self._database_sink(table_name))
+        self._services[port_name] = service
+        self.__logger.info(f'Device {port_name} added.')
+        return service
+
+    def _release(self, service):
+        service.stop()
+        if isinstance(service.buffer, SharedRingBuffer):
+            service.buffer.close()
+            service.buffer.unlink()
+
+    def _database_sink(self, table_name):
+        def write(timestamps, values):
+            self.base.write_many(table_name, np.column_stack((timestamps, values)).tolist())
+        return write
+
+    def _scan_loop(self):
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                self.__logger.error(f'Error scanning ports: {e}')
+            if self._stopping.wait(self.scan_interval):
+                break
@@ -0,0 +1,167 @@
+# {Session archive}
+# Header (32 bytes, little-endian):
+# magic 'SNSA' | version u16 | sensor count u16 | mode u32 (seconds) | start time f64 (unix) | reserved 12 bytes
+#
+# Records (fixed width, appended after the header):
+# delta u64 (microseconds since start time) | value u32 * sensor count
+#
+# Values are the 28-bit sensor readings, so u32 holds them without loss.
+
+import os
+import struct
+
+import numpy as np
+
+from . import auxiliary_modules as am
+
+MAGIC = b'SNSA'
+VERSION = 1
+HEADER = struct.Struct('<4sHHId12x')
+
+def record_dtype(n_sensors):
+    """
+    Returns the NumPy dtype of one archive record.
+    """
+    return np.dtype([('delta', '<u8'), ('values', '<u4', (n_sensors,))])
+
+def read_header(path):
+    """
+    Reads and validates the header of an archive.
+
+    Returns:
+        tuple: (n_sensors, mode, start_time).
+    """
+    with open(path, 'rb') as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f'{path} is too short to be a session archive.')
+    magic, version, n_sensors, mode, start_time = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a session archive.')
+    return n_sensors, mode, start_time
+
+class SessionArchiveWriter:
+    """
+    Append-only writer of a session archive.
+    """
+
+    def __init__(self, path, n_sensors, mode, start_time=None):
+        """
+        Initialize the SessionArchiveWriter. An existing archive is appended to,
+        after dropping a partial record left by an interrupted write.
+
+        Args:
+            path (str): The archive file.
+            n_sensors (int): The number of sensor values in each record.
+            mode (int): The measurement mode from measurement_modes, in seconds.
+            start_time (float, optional): Unix time the deltas are relative to.
+
+        Raises:
+            ValueError: If the existing archive has another sensor count or mode.
+        """
+        self.path = path
+        if am.check_file_in_folder(path) and os.path.getsize(path) >= HEADER.size:
+            stored_sensors, stored_mode, start_time = read_header(path)
+            if (stored_sensors, stored_mode) != (n_sensors, mode):
+                raise ValueError(
+                    f'{path} holds {stored_sensors} sensors in mode {stored_mode}, '
+                    f'not {n_sensors} sensors in mode {mode}.'
+                )
+            size = os.path.getsize(path)
+            itemsize = record_dtype(n_sensors).itemsize
+            whole = HEADER.size + (size - HEADER.size) // itemsize * itemsize
+            if whole != size:
+                os.truncate(path, whole)
+        else:
+            start_time = am.precise_timestamp() if start_time is None else start_time
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, n_sensors, mode, start_time))
+        self.n_sensors = n_sensors
+        self.mode = mode
+        self.start_time = start_time
+        self.dtype = record_dtype(n_sensors)
+        self._file = open(path, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, timestamps, values):
+        """
+        Appends samples to the archive.
+
+        Args:
+            timestamps (array-like): Unix time of each sample.
+            values (array-like): Array of shape (samples, n_sensors).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+        records = np.empty(len(timestamps), dtype=self.dtype)
+        records['delta'] = np.maximum(np.rint((timestamps - self.start_time) * 1e6), 0)
+        records['values'] = np.asarray(values).reshape(-1, self.n_sensors)
+        self._file.write(records.tobytes())
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+class SessionArchive:
+    """
+    Read-only view of a session archive. Records are memory-mapped, so opening
+    and slicing an archive does not copy the data.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the SessionArchive.
+
+        Args:
+            path (str): The archive file.
+        """
+        self.path = path
+        self.n_sensors, self.mode, self.start_time = read_header(path)
+        self.dtype = record_dtype(self.n_sensors)
+        # A record still being written by an open writer is left out.
+        count = (os.path.getsize(path) - HEADER.size) // self.dtype.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def values(self):
+        """
+        Array of shape (records, n_sensors) backed by the file.
+        """
+        return self.records['values']
+
+    @property
+    def timestamps(self):
+        """
+        Unix time of every record.
+        """
+        return self.start_time + self.records['delta'] / 1e6
+
+    def slice(self, start=None, end=None):
+        """
+        Returns the records with start <= timestamp < end. Deltas are sorted,
+        so the bounds are found with a binary search.
+
+        Returns:
+            tuple: (timestamps, values) where values is a view of the file.
+        """
+        deltas = self.records['delta']
+        first = 0 if start is None else np.searchsorted(deltas, max(0.0, (start - self.start_time) * 1e6), 'left')
+        last = len(deltas) if end is None else np.searchsorted(deltas, max(0.0, (end - self.start_time) * 1e6), 'left')
+        records = self.records[first:last]
+        return self.start_time + records['delta'] / 1e6, records['values']
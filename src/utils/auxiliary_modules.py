@@ -1,7 +1,9 @@
-from typing import Iterable, Tuple, List
+from typing import Iterable, Tuple, List, Optional
 import time
 import os
 
+import numpy as np
+
 def grouper(iterable: Iterable, n: int) -> List[Tuple]:
     """
     Splits the iterable object into groups of n pieces.
@@ -25,6 +27,33 @@ def timestamp() -> int:
     """
     return int(time.time())
 
+_CLOCK_ANCHOR = time.time() - time.perf_counter()
+
+def precise_timestamp() -> float:
+    """
+    Returns the current Unix timestamp with sub-microsecond resolution.
+    It follows the monotonic performance counter from process start, so
+    intervals between timestamps are not affected by wall clock adjustments.
+    """
+    return _CLOCK_ANCHOR + time.perf_counter()
+
+def spread_timestamps(previous: Optional[float], timestamp: float, count: int) -> np.ndarray:
+    """
+    Timestamps for the count frames of one read. They arrived since the
+    previous read, so they are spread evenly up to the time of this one.
+
+    Args:
+        previous (float, optional): The time of the previous read, None for the first one.
+        timestamp (float): The time of this read.
+        count (int): The number of frames in this read.
+
+    Returns:
+        np.ndarray: count timestamps, the last one equal to timestamp.
+    """
+    if previous is None:
+        return np.full(count, timestamp)
+    return np.linspace(previous, timestamp, count + 1)[1:]
+
 def check_file_in_folder(folder_path: str) -> bool:
     """ 
     Check file in dir 
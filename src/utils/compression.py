@@ -0,0 +1,155 @@
+# {Compressed sample block}
+# Header (16 bytes, little-endian):
+# encoding u8 | reserved u8 | sensor count u16 | sample count u32 | first timestamp f64 (unix)
+#
+# Encoding 0, integer sensor values:
+# varint stream of the zig-zag timestamp deltas of deltas in microseconds,
+# then the difference order u8 of each sensor (1: deltas, 2: deltas of deltas,
+# whichever encodes shorter), then sensor by sensor the varint stream of the
+# zig-zag values differenced that many times.
+# Encoding 1, other values: the same timestamps, then the values as float64.
+# Everything after the header is deflated (zlib level 1), which removes the
+# repetition left in periodic signals at little cost.
+#
+# Timestamps are kept to the microsecond, like the session archive.
+
+import struct
+import zlib
+
+import numpy as np
+
+HEADER = struct.Struct('<BxHId')
+INTEGERS = 0
+FLOATS = 1
+
+def zigzag(values):
+    """
+    Maps signed to unsigned integers so that small magnitudes stay small: 0, -1, 1, -2 -> 0, 1, 2, 3.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+def unzigzag(values):
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+def varint_lengths(values):
+    """
+    Returns the number of bytes of each value as a varint.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(values.shape, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    return lengths
+
+def difference(values, order):
+    """
+    Differences the columns order times, the first row from 0, so that
+    cumulative sums order times give the values back.
+    """
+    for _ in range(order):
+        values = np.diff(values, axis=0, prepend=0)
+    return values
+
+def encode_varints(values):
+    """
+    Encodes unsigned integers as LEB128 varints, 7 bits per byte, vectorized.
+
+    Returns:
+        bytes: The encoded stream.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = varint_lengths(values)
+    offsets = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for position in range(int(lengths.max(initial=0))):
+        selected = lengths > position
+        chunk = (values[selected] >> np.uint64(7 * position)) & np.uint64(0x7F)
+        more = (lengths[selected] > position + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[selected] + position] = chunk | more
+    return out.tobytes()
+
+def decode_varints(data, count=None):
+    """
+    Decodes a LEB128 varint stream, vectorized.
+
+    Args:
+        data (bytes): The encoded stream.
+        count (int, optional): Decode only the first count values.
+
+    Returns:
+        tuple: (np.ndarray of uint64 values, number of bytes consumed).
+    """
+    stream = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(stream < 0x80)
+    if count is not None:
+        ends = ends[:count]
+    if len(ends) == 0:
+        return np.empty(0, dtype=np.uint64), 0
+    used = int(ends[-1]) + 1
+    stream = stream[:used]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    positions = np.arange(used) - np.repeat(starts, ends - starts + 1)
+    parts = (stream & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, starts), used
+
+def encode_block(timestamps, values):
+    """
+    Encodes samples into one compressed block.
+
+    Args:
+        timestamps (array-like): Unix time of each sample, increasing.
+        values (array-like): Array of shape (samples, sensors).
+
+    Returns:
+        bytes: The block.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values.reshape(len(timestamps), -1)
+    count, n_sensors = values.shape
+    first = float(timestamps[0]) if count else 0.0
+
+    micros = np.rint((timestamps - first) * 1e6).astype(np.int64)
+    time_stream = encode_varints(zigzag(difference(micros, 2)))
+
+    integral = np.all(np.abs(values) < 2 ** 62) and np.array_equal(values, np.rint(values))
+    if integral:
+        integers = values.astype(np.int64)
+        candidates = [zigzag(difference(integers, order)) for order in (1, 2)]
+        # Per sensor, the order whose varints are shorter: 2 suits smooth signals, 1 noisy ones.
+        orders = 1 + (varint_lengths(candidates[1]).sum(axis=0) < varint_lengths(candidates[0]).sum(axis=0))
+        columns = np.where(orders == 2, candidates[1], candidates[0])
+        value_stream = orders.astype(np.uint8).tobytes() + encode_varints(columns.T.reshape(-1))
+        encoding = INTEGERS
+    else:
+        value_stream = values.astype('<f8').tobytes()
+        encoding = FLOATS
+    return HEADER.pack(encoding, n_sensors, count, first) + zlib.compress(time_stream + value_stream, 1)
+
+def decode_block(block):
+    """
+    Decodes a block made by encode_block().
+
+    Returns:
+        tuple: (timestamps, values of shape (samples, sensors)).
+    """
+    encoding, n_sensors, count, first = HEADER.unpack_from(block)
+    body = memoryview(zlib.decompress(memoryview(block)[HEADER.size:]))
+    deltas_of_deltas, used = decode_varints(body, count)
+    micros = np.cumsum(np.cumsum(unzigzag(deltas_of_deltas)))
+    timestamps = first + micros / 1e6
+
+    body = body[used:]
+    if encoding == INTEGERS:
+        orders = np.frombuffer(body, dtype=np.uint8, count=n_sensors)
+        columns, _ = decode_varints(body[n_sensors:], count * n_sensors)
+        values = unzigzag(columns).reshape(n_sensors, count).T
+        for order in range(int(orders.max(initial=0))):
+            values[:, orders > order] = np.cumsum(values[:, orders > order], axis=0)
+        values = values.astype(np.float64)
+    else:
+        values = np.frombuffer(body, dtype='<f8', count=count * n_sensors).reshape(count, n_sensors)
+    return timestamps, values
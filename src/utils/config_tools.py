@@ -39,7 +39,12 @@ class ConfigurationTool:
                 't_0': 40,
                 't_1': 60
             },
-            'timeout_under_measure': 10
+            'timeout_under_measure': 10,
+            'sample_rate': 10,
+            'virtual_devices': [],
+            'acquisition_process': False,
+            'live_updates': 'push',
+            'cold_storage_age': 86400
         }
         return default_config
 
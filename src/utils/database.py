@@ -1,5 +1,31 @@
+import atexit
+import collections
+import heapq
+import itertools
+import os
+import queue
 import sqlite3
+import threading
+import time
+
+import numpy as np
+
 from . import auxiliary_modules as am
+from . import metrics
+from .compression import encode_block, decode_block
+
+PRAGMAS = (
+    # Takes effect for new databases; an existing one needs a VACUUM once.
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000",
+)
+
+ROLLUP_RESOLUTIONS = (1, 10, 60)
+BLOCK_SIZE = 4096
 
 class DataBase:
     def __init__(self, logger, db_name):
@@ -7,10 +33,34 @@ class DataBase:
         self.conn = None
         self.cursor = None
         self.__logger = logger
+        self._insert_queries = {}
+        self._rollup_queries = {}
+        self._rollup_tables = {}
+        self._block_tables = {}
+        self._queue = None
+        self._writer = None
+        self._rows_written = 0
+        self._flushes = collections.deque()
+        self._compactor = None
+        self._compaction_stopping = threading.Event()
+
+    def _connect(self):
+        """
+        Opens a connection with WAL journaling and the tuned pragmas.
+        The connection may be used from the acquisition and dashboard threads,
+        SQLite serializes the access.
+        """
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
 
     def open(self):
+        db_dir = os.path.dirname(self.db_name)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
         try:
-            self.conn = sqlite3.connect(self.db_name)
+            self.conn = self._connect()
             self.cursor = self.conn.cursor()
         except sqlite3.Error as e:
             self.__logger.error(f"Error opening database: {e}")
@@ -25,44 +75,261 @@ class DataBase:
                 self.conn = None
                 self.cursor = None
 
-    def create_table(self, table_name, num_sensor_fields):
+    def create_table(self, table_name, num_sensor_fields, rollups=True, blocks=True):
         """
         Creates a default table with a 'timestamp' field and the specified number of sensor fields.
+        With rollups, per-sensor min/max/sum/count tables are created for every
+        resolution in ROLLUP_RESOLUTIONS and kept up to date on every write.
+        With blocks, a {table}_blocks table receives the rows moved by compact().
         """
         try:
             fields = ', '.join([f'sensor_{i} REAL' for i in range(num_sensor_fields)])
             query = f"""
             CREATE TABLE IF NOT EXISTS {table_name} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp INTEGER,
+                timestamp REAL,
                 {fields}
             )
             """
             self.cursor.execute(query)
+            self.cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_timestamp ON {table_name} (timestamp)"
+            )
+            if rollups:
+                aggregates = ', '.join(
+                    f'sensor_{i}_min REAL, sensor_{i}_max REAL, sensor_{i}_sum REAL' for i in range(num_sensor_fields)
+                )
+                for resolution in ROLLUP_RESOLUTIONS:
+                    self.cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table_name}_rollup_{resolution} (
+                        bucket INTEGER PRIMARY KEY,
+                        count INTEGER,
+                        {aggregates}
+                    )
+                    """)
+            if blocks:
+                self.cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table_name}_blocks (
+                    start REAL,
+                    end REAL,
+                    count INTEGER,
+                    data BLOB
+                )
+                """)
+                self.cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table_name}_blocks_end ON {table_name}_blocks (end)"
+                )
             self.conn.commit()
+            self._rollup_tables.pop(table_name, None)
+            self._block_tables.pop(table_name, None)
         except sqlite3.Error as e:
             self.__logger.error(f"Error creating table: {e}")
 
-    def write_data(self, table_name, sensor_values):
+    def _insert_query(self, table_name, num_sensor_fields):
         """
-        Writes data to the specified table.
-        sensor_values should be a list of numerical values corresponding to the sensor fields.
+        Returns the INSERT statement for the table, built once per table.
+        sqlite3 keeps the prepared statement of every cached SQL text.
         """
-        try:
-            timestamp = am.timestamp()
-            placeholders = ', '.join(['?'] * (len(sensor_values) + 1))
+        key = (table_name, num_sensor_fields)
+        query = self._insert_queries.get(key)
+        if query is None:
+            placeholders = ', '.join(['?'] * (num_sensor_fields + 1))
             query = f"""
-            INSERT INTO {table_name} (timestamp, {', '.join([f'sensor_{i}' for i in range(len(sensor_values))])})
+            INSERT INTO {table_name} (timestamp, {', '.join([f'sensor_{i}' for i in range(num_sensor_fields)])})
             VALUES ({placeholders})
             """
-            self.cursor.execute(query, [timestamp] + sensor_values)
-            self.conn.commit()
+            self._insert_queries[key] = query
+        return query
+
+    def _insert_rows(self, conn, table_name, rows):
+        """
+        Inserts rows of (timestamp, sensor_0, ...) in one transaction.
+        """
+        with metrics.db_insert_seconds.time(), conn:
+            conn.executemany(self._insert_query(table_name, len(rows[0]) - 1), rows)
+            if self._has_rollups(conn, table_name):
+                self._update_rollups(conn, table_name, rows)
+        metrics.db_rows.inc(len(rows))
+
+    def _has_rollups(self, conn, table_name):
+        has_rollups = self._rollup_tables.get(table_name)
+        if has_rollups is None:
+            query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+            has_rollups = conn.execute(query, (f'{table_name}_rollup_{ROLLUP_RESOLUTIONS[0]}',)).fetchone() is not None
+            self._rollup_tables[table_name] = has_rollups
+        return has_rollups
+
+    def _rollup_query(self, table_name, resolution, num_sensor_fields):
+        key = (table_name, resolution, num_sensor_fields)
+        query = self._rollup_queries.get(key)
+        if query is None:
+            sensors = [f'sensor_{i}' for i in range(num_sensor_fields)]
+            columns = ', '.join(f'{s}_min, {s}_max, {s}_sum' for s in sensors)
+            placeholders = ', '.join(['?'] * (3 * num_sensor_fields + 2))
+            updates = ', '.join(
+                f'{s}_min = min({s}_min, excluded.{s}_min), '
+                f'{s}_max = max({s}_max, excluded.{s}_max), '
+                f'{s}_sum = {s}_sum + excluded.{s}_sum'
+                for s in sensors
+            )
+            query = f"""
+            INSERT INTO {table_name}_rollup_{resolution} (bucket, count, {columns})
+            VALUES ({placeholders})
+            ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count, {updates}
+            """
+            self._rollup_queries[key] = query
+        return query
+
+    def _update_rollups(self, conn, table_name, rows):
+        """
+        Aggregates a batch per bucket and merges it into every rollup table.
+        """
+        data = np.asarray(rows, dtype=np.float64)
+        timestamps, values = data[:, 0], data[:, 1:]
+        num_sensor_fields = values.shape[1]
+        for resolution in ROLLUP_RESOLUTIONS:
+            buckets = (np.floor(timestamps / resolution) * resolution).astype(np.int64)
+            order = np.argsort(buckets, kind='stable')
+            buckets, ordered = buckets[order], values[order]
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            counts = np.diff(np.append(starts, len(buckets)))
+
+            aggregates = np.empty((len(starts), num_sensor_fields, 3))
+            aggregates[:, :, 0] = np.minimum.reduceat(ordered, starts)
+            aggregates[:, :, 1] = np.maximum.reduceat(ordered, starts)
+            aggregates[:, :, 2] = np.add.reduceat(ordered, starts)
+            merged = np.column_stack((buckets[starts], counts, aggregates.reshape(len(starts), -1)))
+            conn.executemany(
+                self._rollup_query(table_name, resolution, num_sensor_fields),
+                [(int(row[0]), int(row[1]), *row[2:]) for row in merged.tolist()]
+            )
+
+    def write_data(self, table_name, sensor_values, timestamp=None):
+        """
+        Writes data to the specified table.
+        sensor_values should be a list of numerical values corresponding to the sensor fields.
+        When the batch writer is running the row is queued instead.
+        """
+        if timestamp is None:
+            timestamp = am.precise_timestamp()
+        self.write_many(table_name, [(timestamp, *sensor_values)])
+
+    def write_many(self, table_name, rows):
+        """
+        Writes rows of (timestamp, sensor_0, sensor_1, ...) to the specified table.
+        When the batch writer is running the rows are queued instead.
+        """
+        if not rows:
+            return
+        if self._writer is not None:
+            self._queue.put((table_name, rows))
+            metrics.db_queue_depth.set(self._queue.qsize())
+            return
+        try:
+            self._insert_rows(self.conn, table_name, rows)
         except sqlite3.Error as e:
             self.__logger.error(f"Error writing data: {e}")
 
+    def start_writer(self, batch_size=1000, flush_interval=0.5, max_queue=10000):
+        """
+        Starts the background writer. Queued rows are written with executemany
+        in one transaction once batch_size rows are pending or flush_interval
+        seconds have passed. Pending rows are flushed when the process exits.
+        """
+        if self._writer is not None:
+            return
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(batch_size, flush_interval), name='database-writer', daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.stop_writer)
+
+    def flush(self):
+        """
+        Blocks until every queued row is committed.
+        """
+        if self._writer is not None:
+            self._queue.join()
+
+    def stop_writer(self):
+        """
+        Flushes the queued rows and stops the background writer.
+        """
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        atexit.unregister(self.stop_writer)
+
+    def writer_stats(self):
+        """
+        Returns the write rate over the last seconds and the queue depth.
+        """
+        now = time.monotonic()
+        while self._flushes and now - self._flushes[0][0] > 10:
+            self._flushes.popleft()
+        window = now - self._flushes[0][0] if len(self._flushes) > 1 else 0
+        rows = sum(count for _, count in self._flushes)
+        return {
+            'rows_per_second': rows / window if window else 0.0,
+            'rows_written': self._rows_written,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _write_loop(self, batch_size, flush_interval):
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error opening database: {e}")
+            return
+
+        pending = collections.defaultdict(list)
+        pending_count = 0
+        taken = 0
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                taken += 1
+                if item is None:
+                    stopping = True
+                else:
+                    table_name, rows = item
+                    pending[table_name].extend(rows)
+                    pending_count += len(rows)
+                    if deadline is None:
+                        deadline = time.monotonic() + flush_interval
+            except queue.Empty:
+                pass
+            metrics.db_queue_depth.set(self._queue.qsize())
+
+            if pending_count and (stopping or pending_count >= batch_size or time.monotonic() >= deadline):
+                for table_name, rows in pending.items():
+                    try:
+                        self._insert_rows(conn, table_name, rows)
+                    except sqlite3.Error as e:
+                        self.__logger.error(f"Error writing data: {e}")
+                self._rows_written += pending_count
+                self._flushes.append((time.monotonic(), pending_count))
+                pending.clear()
+                pending_count = 0
+                deadline = None
+            if pending_count == 0:
+                for _ in range(taken):
+                    self._queue.task_done()
+                taken = 0
+        conn.close()
+
     def read_data(self, table_name):
         """
-        Reads data from the specified table.
+        Reads every row of the specified table, all columns included.
+
+        Rows moved into compressed blocks by compact() are not in the table
+        any more and are not returned; query_range() reads both.
         """
         try:
             query = f"SELECT * FROM {table_name}"
@@ -72,6 +339,339 @@ class DataBase:
             self.__logger.error(f"Error reading data: {e}")
             return []
 
+    def query_range(self, table_name, start=None, end=None, sensors=None, limit=None, chunk_size=1000):
+        """
+        Yields (timestamp, sensor values...) rows with start <= timestamp < end,
+        ordered by timestamp, from the compressed blocks and the table merged.
+        Rows are fetched chunk_size at a time, so memory use does not depend
+        on the size of the table.
+        sensors is an optional list of sensor indices to return.
+        """
+        if limit == 0:
+            return
+        blocks = (
+            row
+            for timestamps, values in self._block_samples(table_name, start, end, sensors)
+            for row in map(tuple, np.column_stack((timestamps, values)).tolist())
+        )
+        rows = heapq.merge(blocks, self._range_rows(table_name, start, end, sensors, limit, chunk_size),
+                           key=lambda row: row[0])
+        yield from itertools.islice(rows, limit)
+
+    def _range_rows(self, table_name, start, end, sensors, limit, chunk_size):
+        query, parameters = self._range_query(table_name, start, end, sensors, limit)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(query, parameters)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading data: {e}")
+
+    def query_range_arrays(self, table_name, start=None, end=None, sensors=None, limit=None, chunk_size=10000):
+        """
+        Same as query_range() but returns one NumPy array per column,
+        keyed by column name.
+        """
+        columns = ['timestamp'] + [f'sensor_{i}' for i in self._sensor_indices(table_name, sensors)]
+        chunks = []
+        stored = 0
+        # Blocks come in timestamp order: the first limit rows of the result
+        # are among the first limit rows of the blocks and of the table.
+        for timestamps, values in self._block_samples(table_name, start, end, sensors):
+            chunks.append(np.column_stack((timestamps, values)))
+            stored += len(timestamps)
+            if limit is not None and stored >= limit:
+                break
+        query, parameters = self._range_query(table_name, start, end, sensors, limit)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(query, parameters)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=np.float64).reshape(len(rows), len(columns)))
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading data: {e}")
+
+        data = np.concatenate(chunks) if chunks else np.empty((0, len(columns)))
+        if stored and len(data) > stored:
+            # Late rows of the table can be older than compacted ones.
+            data = data[np.argsort(data[:, 0], kind='stable')]
+        data = data[:limit]
+        return {column: data[:, i] for i, column in enumerate(columns)}
+
+    def query_rollup(self, table_name, start, end, points, sensors=None):
+        """
+        Returns per-bucket min/max/mean/count for start <= timestamp < end from
+        the coarsest rollup that still gives at least the requested number of
+        points. Falls back to raw rows when even the finest rollup is too coarse.
+
+        Returns:
+            dict: NumPy arrays keyed by 'timestamp', 'count' and 'sensor_N_min',
+            'sensor_N_max', 'sensor_N_mean', plus the chosen 'resolution'
+            in seconds (0 for raw rows).
+        """
+        indices = self._sensor_indices(table_name, sensors)
+        span = end - start
+        resolution = next((r for r in sorted(ROLLUP_RESOLUTIONS, reverse=True) if span / r >= points), None)
+
+        if resolution is None or not self._has_rollups(self.conn, table_name):
+            raw = self.query_range_arrays(table_name, start, end, indices)
+            result = {'resolution': 0, 'timestamp': raw['timestamp'], 'count': np.ones(len(raw['timestamp']))}
+            for i in indices:
+                for aggregate in ('min', 'max', 'mean'):
+                    result[f'sensor_{i}_{aggregate}'] = raw[f'sensor_{i}']
+            return result
+
+        fields = ', '.join(f'sensor_{i}_min, sensor_{i}_max, sensor_{i}_sum' for i in indices)
+        query = f"""
+        SELECT bucket, count, {fields} FROM {table_name}_rollup_{resolution}
+        WHERE bucket >= ? AND bucket < ? ORDER BY bucket
+        """
+        try:
+            rows = self.conn.execute(query, (int(start // resolution * resolution), end)).fetchall()
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading data: {e}")
+            rows = []
+
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), 2 + 3 * len(indices))
+        result = {'resolution': resolution, 'timestamp': data[:, 0], 'count': data[:, 1]}
+        for n, i in enumerate(indices):
+            column = 2 + 3 * n
+            result[f'sensor_{i}_min'] = data[:, column]
+            result[f'sensor_{i}_max'] = data[:, column + 1]
+            result[f'sensor_{i}_mean'] = data[:, column + 2] / data[:, 1]
+        return result
+
+    def _sensor_indices(self, table_name, sensors, conn=None):
+        if sensors is not None:
+            return list(sensors)
+        conn = conn or self.conn
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+        return [int(column[len('sensor_'):]) for column in columns if column.startswith('sensor_')]
+
+    def _range_query(self, table_name, start, end, sensors, limit):
+        """
+        Builds the SELECT for a time range. The timestamp index serves both
+        the WHERE clause and the ORDER BY.
+        """
+        fields = ', '.join(f'sensor_{i}' for i in self._sensor_indices(table_name, sensors))
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            parameters.append(end)
+        query = f"SELECT timestamp, {fields} FROM {table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        return query, parameters
+
+    def _has_blocks(self, conn, table_name):
+        has_blocks = self._block_tables.get(table_name)
+        if has_blocks is None:
+            query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+            has_blocks = conn.execute(query, (f'{table_name}_blocks',)).fetchone() is not None
+            self._block_tables[table_name] = has_blocks
+        return has_blocks
+
+    def _block_samples(self, table_name, start, end, sensors):
+        """
+        Yields (timestamps, values) of the compressed blocks overlapping the
+        time range, limited to the range and in timestamp order. The block
+        index on 'end' selects the blocks, the others are never decoded.
+
+        A block of late rows compacted after its neighbours overlaps them.
+        Blocks are read by start, so the rows before the start of the next
+        block are final and only the overlap is held back.
+        """
+        try:
+            if not self._has_blocks(self.conn, table_name):
+                return
+            stored = self._sensor_indices(table_name, None)
+            positions = [stored.index(i) for i in self._sensor_indices(table_name, sensors)]
+            conditions = []
+            parameters = []
+            if start is not None:
+                conditions.append("end >= ?")
+                parameters.append(start)
+            if end is not None:
+                conditions.append("start < ?")
+                parameters.append(end)
+            query = f"SELECT start, data FROM {table_name}_blocks"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            cursor = self.conn.cursor()
+            cursor.execute(query + " ORDER BY start", parameters)
+            pending_timestamps = np.empty(0)
+            pending_values = np.empty((0, len(positions)))
+            # The cursor steps through the rows: one compressed block, and the overlap, are in memory at a time.
+            for block_start, data in cursor:
+                split = np.searchsorted(pending_timestamps, block_start, side='right')
+                if split:
+                    yield pending_timestamps[:split], pending_values[:split]
+                timestamps, values = decode_block(data)
+                inside = np.ones(len(timestamps), dtype=bool)
+                if start is not None:
+                    inside &= timestamps >= start
+                if end is not None:
+                    inside &= timestamps < end
+                timestamps = np.concatenate((pending_timestamps[split:], timestamps[inside]))
+                values = np.concatenate((pending_values[split:], values[inside][:, positions]))
+                if split < len(pending_timestamps):
+                    order = np.argsort(timestamps, kind='stable')
+                    timestamps, values = timestamps[order], values[order]
+                pending_timestamps, pending_values = timestamps, values
+            if len(pending_timestamps):
+                yield pending_timestamps, pending_values
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading data: {e}")
+
+    def compact(self, table_name, before, block_size=BLOCK_SIZE, conn=None):
+        """
+        Moves the rows with timestamp < before into compressed blocks of
+        block_size rows, oldest first, one transaction per block. Rows that do
+        not fill a block stay until enough of them are old enough.
+
+        Returns:
+            int: The number of rows moved.
+        """
+        conn = conn or self.conn
+        moved = 0
+        try:
+            fields = ', '.join(f'sensor_{i}' for i in self._sensor_indices(table_name, None, conn))
+            select = f"SELECT id, timestamp, {fields} FROM {table_name} WHERE timestamp < ? ORDER BY timestamp LIMIT ?"
+            while True:
+                rows = conn.execute(select, (before, block_size)).fetchall()
+                if len(rows) < block_size:
+                    break
+                data = np.array(rows, dtype=np.float64)
+                with conn:
+                    conn.execute(
+                        f"INSERT INTO {table_name}_blocks (start, end, count, data) VALUES (?, ?, ?, ?)",
+                        (data[0, 1], data[-1, 1], len(rows), encode_block(data[:, 1], data[:, 2:]))
+                    )
+                    conn.executemany(f"DELETE FROM {table_name} WHERE id = ?", [(row[0],) for row in rows])
+                moved += len(rows)
+            if moved:
+                # executescript() steps the pragma to completion, execute() would free one page.
+                conn.executescript("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error compacting {table_name}: {e}")
+        metrics.db_compacted_rows.inc(moved)
+        return moved
+
+    def compact_all(self, before, block_size=BLOCK_SIZE, conn=None):
+        """
+        Compacts every table that has a blocks table.
+
+        Returns:
+            int: The number of rows moved.
+        """
+        conn = conn or self.conn
+        try:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading tables: {e}")
+            return 0
+        tables = sorted(name for name in names if f'{name}_blocks' in names)
+        return sum(self.compact(table_name, before, block_size, conn) for table_name in tables)
+
+    def start_compaction(self, age, interval=600.0, block_size=BLOCK_SIZE):
+        """
+        Starts the background compaction: every interval seconds the rows
+        older than age seconds are moved into compressed blocks.
+        """
+        if self._compactor is not None:
+            return
+        self._compaction_stopping.clear()
+        self._compactor = threading.Thread(
+            target=self._compaction_loop, args=(age, interval, block_size), name='database-compaction', daemon=True
+        )
+        self._compactor.start()
+
+    def stop_compaction(self):
+        self._compaction_stopping.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _compaction_loop(self, age, interval, block_size):
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error opening database: {e}")
+            return
+        while True:
+            moved = self.compact_all(am.precise_timestamp() - age, block_size, conn)
+            if moved:
+                self.__logger.info(f'Compacted {moved} rows.')
+            if self._compaction_stopping.wait(interval):
+                break
+        conn.close()
+
+    def create_signature_table(self):
+        """
+        Creates the table of labelled reference signatures.
+        """
+        try:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp INTEGER,
+                label TEXT,
+                mode INTEGER,
+                features BLOB
+            )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS signatures_mode ON signatures (mode)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error creating table: {e}")
+
+    def write_signature(self, label, mode, features):
+        """
+        Stores a feature vector (float64 NumPy array) under a label.
+        """
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO signatures (timestamp, label, mode, features) VALUES (?, ?, ?, ?)",
+                    (am.timestamp(), label, mode, np.asarray(features, dtype='<f8').tobytes())
+                )
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error writing data: {e}")
+
+    def read_signatures(self, mode=None):
+        """
+        Reads the reference signatures, optionally of one measurement mode.
+
+        Returns:
+            tuple: (labels, feature vectors).
+        """
+        query = "SELECT label, features FROM signatures"
+        parameters = ()
+        if mode is not None:
+            query += " WHERE mode = ?"
+            parameters = (mode,)
+        try:
+            rows = self.conn.execute(query, parameters).fetchall()
+        except sqlite3.Error as e:
+            self.__logger.error(f"Error reading data: {e}")
+            rows = []
+        return [label for label, _ in rows], [np.frombuffer(blob, dtype='<f8') for _, blob in rows]
+
     def delete_data(self, table_name, record_id):
         """
         Deletes data from the specified table by record ID.
@@ -0,0 +1,100 @@
+import numpy as np
+
+def minmax_indices(y, n_buckets):
+    """
+    Picks the indices of the minimum and maximum of each bucket.
+
+    Args:
+        y (np.ndarray): The series to reduce.
+        n_buckets (int): The number of equally sized buckets.
+
+    Returns:
+        np.ndarray: Sorted unique indices, at most 2 * n_buckets of them.
+    """
+    size = len(y)
+    if n_buckets <= 0 or size <= 2 * n_buckets:
+        return np.arange(size)
+
+    bucket_size = int(np.ceil(size / n_buckets))
+    n_buckets = int(np.ceil(size / bucket_size))
+    padded = np.empty(n_buckets * bucket_size, dtype=np.float64)
+    padded[:size] = y
+    padded[size:] = y[-1]
+    buckets = padded.reshape(n_buckets, bucket_size)
+
+    offsets = np.arange(n_buckets) * bucket_size
+    indices = np.concatenate((offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1)))
+    return np.unique(np.minimum(indices, size - 1))
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept. For every bucket in between,
+    the point forming the largest triangle with the previously selected point
+    and the average of the next bucket is kept.
+
+    Args:
+        x (np.ndarray): The x values, increasing.
+        y (np.ndarray): The y values.
+        n_out (int): The number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points.
+    """
+    size = len(y)
+    if n_out >= size or n_out < 3:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.int64)
+
+    # Next bucket averages do not depend on the selection, compute them at once.
+    cumulative_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumulative_y = np.concatenate(([0.0], np.cumsum(y)))
+    next_start = np.append(edges[1:-1], size - 1)
+    next_end = np.append(edges[2:], size)
+    counts = next_end - next_start
+    average_x = (cumulative_x[next_end] - cumulative_x[next_start]) / counts
+    average_y = (cumulative_y[next_end] - cumulative_y[next_start]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[previous] - average_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y[bucket] - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample(x, y, n_out):
+    """
+    Reduces a series to about n_out points while keeping its peaks.
+
+    Long series are first reduced to the minimum and maximum of 2 * n_out
+    buckets, then LTTB picks the final points, so the cost stays close to a
+    couple of vectorized passes over the data.
+
+    Args:
+        x (np.ndarray): The x values, increasing.
+        y (np.ndarray): The y values.
+        n_out (int): The target number of points.
+
+    Returns:
+        tuple: (x, y) of the kept points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= n_out:
+        return x, y
+
+    candidates = minmax_indices(y, 2 * n_out)
+    candidates = np.union1d(candidates, [0, len(y) - 1])
+    kept = candidates[lttb_indices(x[candidates], y[candidates], n_out)]
+    return x[kept], y[kept]
@@ -0,0 +1 @@
+# src/utils/handlers/__init__.py
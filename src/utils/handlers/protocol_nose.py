@@ -0,0 +1,140 @@
+# pyserial handler for virtual noses, found through serial.protocol_handler_packages.
+#
+# nose://synthetic?sensors=8&rate=100&noise=0.002&corruption=0.001&seed=1
+# nose://replay?path=data/session.snsa&speed=10&loop=1
+
+import time
+import urllib.parse
+
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError
+
+from ..virtual_device import VirtualSensorDevice, ReplayDevice
+
+MAX_BUFFER = 1 << 20
+
+class Serial(SerialBase):
+    """
+    Serial port backed by a VirtualSensorDevice or a ReplayDevice.
+    Bytes the reader does not consume are dropped beyond MAX_BUFFER, like an
+    input buffer overrun on a real port.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.device = None
+        self._buffer = bytearray()
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self.is_open:
+            raise SerialException('Port is already open.')
+        if self._port is None:
+            raise SerialException('Port must be configured before it can be used.')
+        self.device = self.from_url(self.port)
+        self.device.start()
+        self._buffer.clear()
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+        self.device = None
+        super().close()
+
+    def from_url(self, url):
+        """
+        Creates the virtual device described by the URL.
+        """
+        parts = urllib.parse.urlsplit(url)
+        options = {key: values[0] for key, values in urllib.parse.parse_qs(parts.query).items()}
+        try:
+            if parts.scheme != 'nose':
+                raise ValueError(f'expected nose://, got {parts.scheme}://')
+            if parts.netloc == 'synthetic':
+                return VirtualSensorDevice(
+                    n_sensors=int(options.get('sensors', 8)),
+                    rate=float(options.get('rate', 10)),
+                    noise=float(options.get('noise', 0.002)),
+                    corruption=float(options.get('corruption', 0)),
+                    seed=int(options['seed']) if 'seed' in options else None,
+                )
+            if parts.netloc == 'replay':
+                return ReplayDevice(
+                    options['path'],
+                    speed=float(options.get('speed', 1)),
+                    loop=options.get('loop', '0') not in ('0', 'false'),
+                )
+            raise ValueError(f'unknown device {parts.netloc!r}')
+        except (KeyError, ValueError, OSError) as e:
+            raise SerialException(
+                f'expected "nose://synthetic?..." or "nose://replay?path=...": {e}'
+            )
+
+    def _reconfigure_port(self):
+        pass
+
+    def _fill(self):
+        self._buffer += self.device.read_due(MAX_BUFFER)
+        if len(self._buffer) > MAX_BUFFER:
+            del self._buffer[:len(self._buffer) - MAX_BUFFER]
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self._fill()
+        return len(self._buffer)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        self._fill()
+        while len(self._buffer) < size:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            wait = self.device.time_to_next() or 0.01
+            time.sleep(min(wait, remaining) if remaining is not None else wait)
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return len(data)
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self._fill()
+        self._buffer.clear()
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+
+    def _update_break_state(self):
+        pass
+
+    def _update_rts_state(self):
+        pass
+
+    def _update_dtr_state(self):
+        pass
+
+    @property
+    def cts(self):
+        return True
+
+    @property
+    def dsr(self):
+        return True
+
+    @property
+    def ri(self):
+        return False
+
+    @property
+    def cd(self):
+        return True
@@ -0,0 +1,190 @@
+import numpy as np
+
+from .protocol import VALUE_MASK
+
+STUCK = 'stuck'
+SATURATED = 'saturated'
+SPIKE = 'spike'
+MISSING = 'missing'
+OUT_OF_SEQUENCE = 'out_of_sequence'
+CONDITIONS = (STUCK, SATURATED, SPIKE, MISSING, OUT_OF_SEQUENCE)
+
+_NEVER = np.iinfo(np.int64).min // 2
+# Residuals judged against the same rolling statistics; a large read is
+# checked in chunks so that its later samples see nearly current ones.
+SPIKE_CHUNK = 64
+
+class SensorHealth:
+    """
+    Per-sensor health checks updated as samples arrive, at constant cost per sample.
+
+    Flags stuck values (the same value stuck_samples times in a row),
+    saturation (a value at either end of the 28-bit range), spikes and the
+    missing or out-of-sequence channels reported by the FrameParser.
+
+    A spike is a sample whose deviation from the midpoint of its two
+    neighbours has a rolling z-score above spike_threshold, against an
+    exponentially weighted mean and variance of that deviation. Ramps and
+    exposure curves leave the deviation small, so only sudden jumps count,
+    one sample after they arrived.
+
+    Stuck and saturated last as long as the condition; the other conditions
+    stay active for hold samples after their last occurrence. Events count
+    the onsets of stuck, saturated and spikes and every channel fault.
+    """
+
+    def __init__(self, n_sensors, stuck_samples=50, spike_threshold=8.0, alpha=0.01, warmup=None, hold=100,
+                 low=0, high=VALUE_MASK, min_std=1.0):
+        """
+        Initialize the SensorHealth.
+
+        Args:
+            n_sensors (int): The number of values in each sample.
+            stuck_samples (int): Identical values in a row that make a sensor stuck.
+            spike_threshold (float): The z-score above which a sample is a spike.
+            alpha (float): The smoothing factor of the rolling mean and variance.
+            warmup (int, optional): Samples seen before spikes are flagged, 3 / alpha by default.
+            hold (int): Samples a spike or channel fault stays active.
+            low (int): Values at or below low are saturated.
+            high (int): Values at or above high are saturated.
+            min_std (float): Lower bound of the standard deviation, for flat signals.
+        """
+        self.n_sensors = n_sensors
+        self.stuck_samples = stuck_samples
+        self.spike_threshold = spike_threshold
+        self.alpha = alpha
+        self.warmup = warmup if warmup is not None else int(3 / alpha)
+        self.hold = hold
+        self.low = low
+        self.high = high
+        self.min_std = min_std
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.events = {condition: np.zeros(self.n_sensors, dtype=np.int64) for condition in CONDITIONS}
+        self._last_event = {condition: np.full(self.n_sensors, _NEVER) for condition in (SPIKE, MISSING, OUT_OF_SEQUENCE)}
+        self._run = np.zeros(self.n_sensors, dtype=np.int64)
+        self._saturated = np.zeros(self.n_sensors, dtype=bool)
+        self._tail = np.empty((0, self.n_sensors))
+        self._residuals = 0
+        self._spiking = np.zeros(self.n_sensors, dtype=bool)
+        self._mean = np.zeros(self.n_sensors)
+        self._variance = np.zeros(self.n_sensors)
+
+    def update(self, values, missing=None, out_of_sequence=None):
+        """
+        Checks a batch of samples.
+
+        Args:
+            values (array-like): Array of shape (samples, n_sensors).
+            missing (array-like, optional): Per channel, the frames that lacked it
+                since the previous batch, as counted by the FrameParser.
+            out_of_sequence (array-like, optional): Per channel, the words carrying
+                another channel number in its place since the previous batch.
+
+        Returns:
+            list: (sensor, condition) pairs with new events in this batch, even
+            if the condition already ended within it.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.n_sensors)
+        before = np.array([self.events[condition] for condition in CONDITIONS])
+        for condition, counts in ((MISSING, missing), (OUT_OF_SEQUENCE, out_of_sequence)):
+            if counts is not None:
+                counts = np.asarray(counts, dtype=np.int64)
+                self.events[condition] += counts
+                self._last_event[condition][counts > 0] = self.count
+        if len(values):
+            self._check_values(values)
+        after = np.array([self.events[condition] for condition in CONDITIONS])
+        return [(int(sensor), CONDITIONS[condition]) for condition, sensor in np.argwhere(after > before)]
+
+    def _check_values(self, values):
+        size = len(values)
+        first = self.count
+
+        # Run length of equal values at every sample, carried over from the previous batch.
+        previous = np.vstack((self._tail[-1:], values[:-1]))
+        changed = np.ones(values.shape, dtype=bool)
+        changed[size - len(previous):] = values[size - len(previous):] != previous
+        rows = np.arange(size)[:, None]
+        last_change = np.maximum.accumulate(np.where(changed, rows, -1), axis=0)
+        runs = np.where(last_change >= 0, rows - last_change + 1, self._run + rows + 1)
+        self.events[STUCK] += (runs == self.stuck_samples).sum(axis=0)
+        self._run = runs[-1]
+
+        saturated = (values <= self.low) | (values >= self.high)
+        onsets = saturated & ~np.vstack((self._saturated[None], saturated[:-1]))
+        self.events[SATURATED] += onsets.sum(axis=0)
+        self._saturated = saturated[-1]
+
+        self._check_spikes(values, first)
+        self.count += size
+
+    def _check_spikes(self, values, first):
+        window = np.vstack((self._tail, values))
+        self._tail = window[-2:]
+        if len(window) < 3:
+            return
+        # Sample i of the window is judged once sample i + 1 has arrived.
+        residuals = window[1:-1] - (window[:-2] + window[2:]) / 2
+        indices = first - len(window) + len(values) + 1 + np.arange(len(residuals))
+
+        for offset in range(0, len(residuals), SPIKE_CHUNK):
+            self._check_residuals(residuals[offset:offset + SPIKE_CHUNK], indices[offset:offset + SPIKE_CHUNK])
+
+    def _check_residuals(self, residuals, indices):
+        std = np.maximum(np.sqrt(self._variance), self.min_std)
+        band = self.spike_threshold * std
+        deviations = residuals - self._mean
+        warm = (self._residuals + np.arange(len(residuals)) >= self.warmup)[:, None]
+        spikes = warm & (np.abs(deviations) > band)
+        # A jump also moves the residuals of both neighbours: count each run once.
+        self.events[SPIKE] += (spikes & ~np.vstack((self._spiking[None], spikes[:-1]))).sum(axis=0)
+        self._spiking = spikes[-1]
+        flagged = spikes.any(axis=0)
+        self._last_event[SPIKE][flagged] = np.where(spikes, indices[:, None], _NEVER).max(axis=0)[flagged]
+        # A spike must not widen the band that detects the next one.
+        deviations = np.where(warm, np.clip(deviations, -band, band), deviations)
+
+        # Exponentially weighted mean and variance, unrolled over the chunk.
+        decay = 1 - self.alpha
+        weights = self.alpha * decay ** np.arange(len(residuals) - 1, -1, -1)
+        shift = weights @ deviations
+        self._mean = self._mean + shift
+        self._variance = np.maximum(decay ** len(residuals) * self._variance + weights @ deviations ** 2 - shift ** 2, 0)
+        self._residuals += len(residuals)
+
+    def active(self):
+        """
+        Returns a boolean array of shape (len(CONDITIONS), n_sensors).
+        """
+        active = np.zeros((len(CONDITIONS), self.n_sensors), dtype=bool)
+        active[CONDITIONS.index(STUCK)] = self._run >= self.stuck_samples
+        active[CONDITIONS.index(SATURATED)] = self._saturated
+        for condition, last in self._last_event.items():
+            active[CONDITIONS.index(condition)] = self.count - last <= self.hold
+        return active
+
+    def snapshot(self):
+        """
+        Returns the active conditions and the event counts, both arrays of
+        shape (len(CONDITIONS), n_sensors) in the order of CONDITIONS.
+        """
+        return {
+            'count': self.count,
+            'active': self.active(),
+            'events': np.array([self.events[condition] for condition in CONDITIONS]),
+        }
+
+def alerts(snapshot):
+    """
+    Lists the active conditions of a snapshot().
+
+    Returns:
+        list: (sensor, condition, events) tuples, sensors numbered from 0.
+    """
+    return [
+        (int(sensor), CONDITIONS[condition], int(snapshot['events'][condition][sensor]))
+        for sensor, condition in np.argwhere(np.asarray(snapshot['active']).T)
+    ]
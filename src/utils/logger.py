@@ -1,26 +1,107 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+
+class DuplicateFilter(logging.Filter):
+    """
+    Drops a message repeated within interval seconds. The next copy let
+    through after the interval tells how many were suppressed.
+
+    Messages whose interval has passed without a suppressed copy are forgotten
+    once per interval. At most max_entries messages are tracked, the oldest
+    are dropped first.
+    """
+
+    def __init__(self, interval, max_entries=1024):
+        super().__init__()
+        self.interval = interval
+        self.max_entries = max_entries
+        self._seen = {}
+        self._swept = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept >= self.interval:
+                self._seen = {
+                    key: (last, suppressed) for key, (last, suppressed) in self._seen.items()
+                    if suppressed or now - last < self.interval
+                }
+                self._swept = now
+            last, suppressed = self._seen.pop(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+            while len(self._seen) > self.max_entries:
+                del self._seen[next(iter(self._seen))]
+        if suppressed:
+            record.msg = f'{record.msg} (suppressed {suppressed} identical messages)'
+        return True
 
 class Logger:
-    def __init__(self, name, log_file=None, level=logging.DEBUG, console_logging=False):
+    def __init__(self, name, log_file=None, level=logging.DEBUG, console_logging=False,
+                 queued=False, max_bytes=None, when=None, backup_count=5, dedup_interval=None):
+        """
+        Args:
+            queued (bool): Hand records to a background thread that does the I/O.
+            max_bytes (int, optional): Rotate the log file at this size.
+            when (str, optional): Rotate the log file by time, e.g. 'midnight'.
+            backup_count (int): The number of rotated files kept.
+            dedup_interval (float, optional): Suppress identical messages repeated within this many seconds.
+        """
         self.logger = logging.getLogger(name)
         self.logger.setLevel(level)
+        self._listener = None
 
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handlers = []
 
         if console_logging:
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
+            handlers.append(console_handler)
 
         if log_file:
             log_dir = os.path.dirname(log_file)
             if log_dir and not os.path.exists(log_dir):
                 os.makedirs(log_dir)
 
-            file_handler = logging.FileHandler(log_file)
+            if max_bytes:
+                file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+            elif when:
+                file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count)
+            else:
+                file_handler = logging.FileHandler(log_file)
             file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        if dedup_interval:
+            self.logger.addFilter(DuplicateFilter(dedup_interval))
+
+        if queued and handlers:
+            log_queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            self._listener.start()
+            atexit.register(self.close)
+            self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        else:
+            for handler in handlers:
+                self.logger.addHandler(handler)
+
+    def close(self):
+        """
+        Writes out the queued records and stops the background thread.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
 
     def debug(self, message):
         self.logger.debug(message)
@@ -35,4 +116,4 @@ class Logger:
         self.logger.error(message)
 
     def critical(self, message):
-        self.logger.critical(message)
\ No newline at end of file
+        self.logger.critical(message)
@@ -0,0 +1,235 @@
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+class Counter:
+    """
+    Monotonic counter.
+
+    Updates take no lock to keep the hot paths cheap; with several writer
+    threads an occasional lost increment is accepted.
+    """
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def state(self):
+        return self.value
+
+    def render(self, others=()):
+        value = self.value + sum(others)
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter', f'{self.name} {value}']
+
+class Gauge:
+    """
+    Value that goes up and down. Either set it or give a callable read at render time.
+    """
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+    def state(self):
+        return self.get()
+
+    def render(self, others=()):
+        value = self.get() + sum(others)
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge', f'{self.name} {value}']
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a binary search and three additions,
+    unlocked like Counter.inc().
+    """
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """
+        Context manager observing the duration of its block in seconds.
+        """
+        return _Timer(self)
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def state(self):
+        return {'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def render(self, others=()):
+        counts = list(self.counts)
+        total, count = self.sum, self.count
+        for other in others:
+            counts = [a + b for a, b in zip(counts, other['counts'])]
+            total += other['sum']
+            count += other['count']
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {cumulative + counts[-1]}')
+        lines.append(f'{self.name}_sum {total}')
+        lines.append(f'{self.name}_count {count}')
+        return lines
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class Registry:
+    """
+    Holds the metrics of the process and renders them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = kind(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text, function=None):
+        gauge = self._get(Gauge, name, help_text)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets)
+
+    def snapshot(self):
+        """
+        Returns the state of every metric by name, JSON-serializable so that
+        another process can add it to its own with render().
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.state() for metric in metrics}
+
+    def render(self, others=()):
+        """
+        Renders the metrics of the process.
+
+        Args:
+            others (iterable): snapshot()s of other processes, added metric by metric.
+        """
+        others = list(others)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render([other[metric.name] for other in others if metric.name in other]))
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+serial_read_seconds = registry.histogram('smartnose_serial_read_seconds', 'Duration of serial reads.')
+serial_bytes = registry.counter('smartnose_serial_bytes_total', 'Bytes read from serial ports.')
+frames_decoded = registry.counter('smartnose_frames_decoded_total', 'Frames decoded by the frame parsers.')
+parser_resyncs = registry.counter('smartnose_parser_resyncs_total', 'Frame realignments after misaligned reads.')
+parser_discarded_bytes = registry.counter('smartnose_parser_discarded_bytes_total', 'Bytes dropped while resynchronizing.')
+sensor_alerts = registry.counter('smartnose_sensor_alerts_total', 'Sensor health alerts raised on the acquisition path.')
+db_insert_seconds = registry.histogram('smartnose_db_insert_seconds', 'Duration of database insert transactions.')
+db_rows = registry.counter('smartnose_db_rows_total', 'Rows written to the database.')
+db_compacted_rows = registry.counter('smartnose_db_compacted_rows_total', 'Rows moved into compressed blocks.')
+db_queue_depth = registry.gauge('smartnose_db_queue_depth', 'Batches waiting in the database writer queue.')
+callback_seconds = registry.histogram('smartnose_callback_seconds', 'Duration of dashboard graph callbacks.')
+figure_bytes = registry.histogram('smartnose_figure_bytes', 'Serialized size of graph updates.', SIZE_BUCKETS)
+cache_hits = registry.counter('smartnose_cache_hits_total', 'Dashboard snapshots served from the cache.')
+cache_misses = registry.counter('smartnose_cache_misses_total', 'Dashboard snapshots computed.')
+
+class MetricsReporter:
+    """
+    Logs a one-line summary of the hot-path metrics every interval seconds.
+    """
+
+    def __init__(self, logger, interval=60.0):
+        self.interval = interval
+        self.__logger = logger
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def start(self):
+        if self._thread is None:
+            self._last = self._totals()
+            self._thread = threading.Thread(target=self._run, name='metrics-reporter', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def summary(self):
+        """
+        Returns the rates since the previous summary and the mean latencies.
+        """
+        totals = self._totals()
+        elapsed = max(totals['time'] - self._last['time'], 1e-9)
+        rates = {key: (totals[key] - self._last[key]) / elapsed for key in ('bytes', 'frames', 'rows')}
+        line = (
+            f"serial {rates['bytes']:.0f} B/s, read {serial_read_seconds.mean() * 1000:.1f} ms avg | "
+            f"decoded {rates['frames']:.0f} frames/s, {parser_resyncs.value} resyncs, "
+            f"{parser_discarded_bytes.value} bytes discarded, {sensor_alerts.value} sensor alerts | "
+            f"db {rates['rows']:.0f} rows/s, insert {db_insert_seconds.mean() * 1000:.1f} ms avg, "
+            f"queue {db_queue_depth.get()} | "
+            f"callback {callback_seconds.mean() * 1000:.1f} ms avg, figure {figure_bytes.mean():.0f} B avg"
+        )
+        self._last = totals
+        return line
+
+    def _totals(self):
+        return {
+            'time': time.monotonic(),
+            'bytes': serial_bytes.value,
+            'frames': frames_decoded.value,
+            'rows': db_rows.value,
+        }
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.__logger.info(f'Metrics: {self.summary()}')
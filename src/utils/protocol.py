@@ -10,7 +10,11 @@
 # Task: Invert byte.
 # In [] most significant sequance.
 
-from . import auxiliary_modules as am
+import numpy as np
+
+WORD_SIZE = 4
+CHANNEL_SHIFT = 28
+VALUE_MASK = (1 << CHANNEL_SHIFT) - 1
 
 class ProtocolHandler:
     """
@@ -25,82 +29,232 @@ class ProtocolHandler:
             byte_data (bytes): The byte data to be processed.
         """
         self.byte_data = byte_data
-        self.hex_str = byte_data.hex()
-        self.byte_arr = []
         self.four_byte_arr = []
 
-    def _group_hex(self):
+    def process(self):
         """
-        Groups hexadecimal strings into pairs of two characters.
+        Main method to process the protocol data and get the result.
 
-        Example: 'ff70...c4' -> ['ff', '70', ..., 'c4']
+        Thin wrapper around decode_words() kept for callers that work with
+        binary strings and parse_num()/parse_elem().
 
         Returns:
-            list: A list of hexadecimal pairs.
+            list: The processed binary array.
         """
-        return [''.join(i) for i in am.grouper(self.hex_str, 2)]
+        words = self.decode_words(self.byte_data)
+        self.four_byte_arr = [format(word, "032b") for word in words.tolist()]
+        return self.four_byte_arr
 
-    def _rearrange_array(self, group):
+    @staticmethod
+    def decode_words(buffer):
         """
-        Rearranges the elements of the array according to the index xor 3.
+        Decodes a buffer into 32-bit protocol words.
 
-        Example: index: 1 2 3 4 5 6 7 8 ... -> 4 3 2 1 8 7 6 5 ...
+        Every word is transmitted least significant byte first, so reversing
+        each group of four bytes (index xor 3) is a little-endian read.
+        Trailing bytes that do not form a whole word are ignored.
 
         Args:
-            group (list): The list of hexadecimal pairs.
+            buffer (bytes | bytearray | memoryview): Raw data of N frames.
 
         Returns:
-            list: The rearranged list of hexadecimal pairs.
+            np.ndarray: Array of uint32 words.
         """
-        return [group[index ^ 3] for index in range(len(group))]
+        count = len(buffer) // WORD_SIZE
+        return np.frombuffer(buffer, dtype='<u4', count=count).astype(np.uint32)
 
-    def _convert_to_bin(self, byte_arr):
+    @staticmethod
+    def decode_frames(buffer):
         """
-        Converts hexadecimal strings to binary.
+        Decodes a buffer of N frames into (channel, value) pairs.
+
+        The result matches process() followed by parse_num()/parse_elem()
+        for every word, without building intermediate strings.
 
         Args:
-            byte_arr (list): The list of hexadecimal pairs.
+            buffer (bytes | bytearray | memoryview): Raw data of N frames.
 
         Returns:
-            list: The list of binary strings.
+            np.ndarray: Array of shape (words, 2) with channel and value columns.
+        """
+        words = ProtocolHandler.decode_words(buffer)
+        pairs = np.empty((words.size, 2), dtype=np.uint32)
+        pairs[:, 0] = words >> CHANNEL_SHIFT
+        pairs[:, 1] = words & VALUE_MASK
+        return pairs
+
+    @staticmethod
+    def parse_num(input_data):
+        """
+        Parses the first 4 bits of the string and returns them as a number.
+        """
+        return int(input_data[:4], base=2)
+
+    @staticmethod
+    def parse_elem(input_data):
         """
-        return [format(int(num, 16), "08b") for num in byte_arr]
+        Parses the remaining bits of the string and returns them as a number.
+        """
+        return int(input_data[4:], base=2)
 
-    def _group_bin(self, bin_arr):
+    @staticmethod
+    def encode_frames(values):
         """
-        Groups binary strings into groups of four elements.
+        Encodes samples into frames, the inverse of decode_frames().
+        Channel numbers 1, 2, ..., n are put in front of the values.
 
         Args:
-            bin_arr (list): The list of binary strings.
+            values (array-like): Array of shape (frames, channels) with 28-bit values.
 
         Returns:
-            list: The list of grouped binary strings.
+            bytes: The frames as sent by the device.
         """
-        return [''.join(i) for i in am.grouper(bin_arr, 4)]
+        values = np.atleast_2d(np.asarray(values, dtype=np.uint32))
+        channels = np.arange(1, values.shape[1] + 1, dtype=np.uint32) << CHANNEL_SHIFT
+        words = (values & VALUE_MASK) | channels
+        return words.astype('<u4').tobytes()
 
-    def process(self):
+
+class FrameParser:
+    """
+    Incremental parser for a stream of frames.
+
+    A frame is n_channels words carrying the channel numbers 1, 2, ..., n in
+    their upper 4 bits. Bytes left over from one call are kept for the next
+    one, and the channel number sequence is used to find the frame boundary
+    again after a partial or misaligned read.
+
+    Whole words skipped between two frames are attributed to channels:
+    missing_channels counts, per channel, the frames that lacked it and
+    out_of_sequence the words that carried another channel number in its
+    place. Skips of partial words are byte losses and only count as resyncs.
+    """
+
+    def __init__(self, n_channels=8):
         """
-        Main method to process the protocol data and get the result.
+        Initialize the FrameParser.
+
+        Args:
+            n_channels (int): The number of channels in one frame.
+        """
+        self.n_channels = n_channels
+        self.frame_size = n_channels * WORD_SIZE
+        self.frames = 0
+        self.resyncs = 0
+        self.discarded_bytes = 0
+        self.missing_channels = np.zeros(n_channels, dtype=np.int64)
+        self.out_of_sequence = np.zeros(n_channels, dtype=np.int64)
+        self._aligned = False
+        self._pending = bytearray()
+        self._channels = np.arange(1, n_channels + 1, dtype=np.uint8)
+
+    def feed(self, data):
+        """
+        Adds received bytes and yields the complete samples.
+
+        Args:
+            data (bytes): Bytes read from the device, of any length.
 
         Returns:
-            list: The processed binary array.
+            Iterator[np.ndarray]: One array of channel values per frame.
         """
-        group = self._group_hex()
-        rearranged_arr = self._rearrange_array(group)
-        bin_arr = self._convert_to_bin(rearranged_arr)
-        self.four_byte_arr = self._group_bin(bin_arr)
-        return self.four_byte_arr
+        return iter(self.feed_batch(data))
 
-    @staticmethod
-    def parse_num(input_data):
+    def feed_batch(self, data):
         """
-        Parses the first 4 bits of the string and returns them as a number.
+        Adds received bytes and returns the complete samples at once.
+
+        Args:
+            data (bytes): Bytes read from the device, of any length.
+
+        Returns:
+            np.ndarray: Array of shape (frames, n_channels) with channel values.
         """
-        return int(input_data[:4], base=2)
+        if data:
+            self._pending += data
+        buffer = np.frombuffer(self._pending, dtype=np.uint8)
+        starts = self._frame_starts(buffer)
 
-    @staticmethod
-    def parse_elem(input_data):
+        chunks = []
+        position = 0
+        while position < len(starts):
+            aligned = starts[position::self.frame_size]
+            broken = np.flatnonzero(~aligned)
+            count = len(aligned) if len(broken) == 0 else int(broken[0])
+            if count:
+                end = position + count * self.frame_size
+                chunks.append(ProtocolHandler.decode_frames(buffer[position:end]))
+                self.frames += count
+                position = end
+                self._aligned = True
+                continue
+            candidates = np.flatnonzero(starts[position:])
+            if len(candidates) == 0:
+                break
+            if self._aligned:
+                self._count_channel_faults(buffer, position, int(candidates[0]))
+            self.resyncs += 1
+            self.discarded_bytes += int(candidates[0])
+            position += int(candidates[0])
+
+        # Offsets checked above cannot start a frame, the rest may be a prefix.
+        keep_from = max(position, len(starts))
+        self.discarded_bytes += keep_from - position
+        if keep_from > position:
+            self._aligned = False
+        del buffer
+        del self._pending[:keep_from]
+
+        if not chunks:
+            return np.empty((0, self.n_channels), dtype=np.uint32)
+        return np.concatenate(chunks)[:, 1].reshape(-1, self.n_channels)
+
+    def reset(self):
         """
-        Parses the remaining bits of the string and returns them as a number.
+        Drops the pending bytes, e.g. after the input buffer was flushed.
+        """
+        self._pending.clear()
+        self._aligned = False
+
+    def _count_channel_faults(self, buffer, position, skipped):
+        """
+        Attributes the words skipped after a frame to channels. Whole frames
+        are compared position by position: every other channel number is out
+        of sequence. Otherwise words went missing; walking the numbers, one
+        ahead of the expected channel means the channels in between are missing.
+        """
+        if skipped % WORD_SIZE:
+            return
+        channels = buffer[position + WORD_SIZE - 1:position + skipped:WORD_SIZE] >> 4
+        if len(channels) % self.n_channels == 0:
+            wrong = channels.reshape(-1, self.n_channels) != self._channels
+            self.out_of_sequence += wrong.sum(axis=0)
+            return
+        expected = 1
+        for channel in channels.tolist():
+            if expected > self.n_channels:
+                expected = 1
+            if expected < channel <= self.n_channels:
+                self.missing_channels[expected - 1:channel - 1] += 1
+            elif channel != expected:
+                self.out_of_sequence[expected - 1] += 1
+                channel = expected
+            expected = channel + 1
+        if 1 < expected <= self.n_channels:
+            self.missing_channels[expected - 1:] += 1
+
+    def _frame_starts(self, buffer):
+        """
+        Marks every byte offset where a whole frame with the expected channel
+        sequence begins. The channel number is the upper nibble of the last
+        byte of each little-endian word.
         """
-        return int(input_data[4:], base=2)
\ No newline at end of file
+        count = len(buffer) - self.frame_size + 1
+        if count <= 0:
+            return np.zeros(0, dtype=bool)
+        nibbles = buffer >> 4
+        starts = np.ones(count, dtype=bool)
+        for index, channel in enumerate(self._channels):
+            offset = index * WORD_SIZE + WORD_SIZE - 1
+            starts &= nibbles[offset:offset + count] == channel
+        return starts
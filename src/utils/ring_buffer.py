@@ -0,0 +1,228 @@
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+class RingBuffer:
+    """
+    Fixed-size, preallocated buffer of timestamped sensor samples.
+
+    The buffer has a single producer (the acquisition thread) and any number
+    of readers. Readers never take a lock: they copy the region they need and
+    retry if the producer claimed any of its slots in the meantime. A reader
+    that has nothing to do until new samples arrive can block in wait().
+    """
+
+    def __init__(self, capacity, width):
+        """
+        Initialize the RingBuffer.
+
+        Args:
+            capacity (int): The maximum number of samples kept.
+            width (int): The number of values in each sample.
+        """
+        self.capacity = capacity
+        self.width = width
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros((capacity, width), dtype=np.float64)
+        self._claimed = 0
+        self._written = 0
+        self._arrived = threading.Condition()
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    @property
+    def sequence(self):
+        """
+        Total number of samples ever written. Used as a data version.
+        """
+        return self._written
+
+    def extend(self, timestamps, values):
+        """
+        Appends samples, overwriting the oldest ones when the buffer is full.
+
+        Args:
+            timestamps (array-like): One timestamp per sample.
+            values (array-like): Array of shape (samples, width).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.width)
+        count = len(values)
+        if count == 0:
+            return
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[-self.capacity:]
+            skipped = count - self.capacity
+            self._claimed = self._written = self._written + skipped
+            count = self.capacity
+
+        start = self._written % self.capacity
+        self._claimed = self._written + count
+        head = min(count, self.capacity - start)
+        self._timestamps[start:start + head] = timestamps[:head]
+        self._values[start:start + head] = values[:head]
+        if head < count:
+            self._timestamps[:count - head] = timestamps[head:]
+            self._values[:count - head] = values[head:]
+        self._written = self._claimed
+        with self._arrived:
+            self._arrived.notify_all()
+
+    def wait(self, sequence, timeout=None):
+        """
+        Blocks until the sequence number differs from sequence, i.e. samples
+        were written after it, or until timeout seconds have passed.
+
+        Returns:
+            bool: True if the sequence number moved on.
+        """
+        with self._arrived:
+            return self._arrived.wait_for(lambda: self._written != sequence, timeout)
+
+    def since(self, sequence, max_samples=None):
+        """
+        Returns the samples written after the given sequence number.
+
+        Args:
+            sequence (int): Sequence number returned by a previous call.
+            max_samples (int, optional): Return at most this many newest samples.
+
+        Returns:
+            tuple: (timestamps, values, sequence) where sequence is the value
+            to pass to the next call.
+        """
+        while True:
+            written = self._written
+            first = max(sequence, written - self.capacity)
+            if max_samples is not None:
+                first = max(first, written - max_samples)
+            first = min(first, written)
+            timestamps, values = self._copy(first, written)
+            if self._claimed - self.capacity <= first:
+                return timestamps, values, written
+
+    def snapshot(self, max_samples=None):
+        """
+        Returns a consistent copy of the buffered samples, oldest first.
+
+        Args:
+            max_samples (int, optional): Return at most this many newest samples.
+
+        Returns:
+            tuple: (timestamps, values, sequence).
+        """
+        return self.since(0, max_samples)
+
+    def _copy(self, first, last):
+        count = last - first
+        start = first % self.capacity
+        head = min(count, self.capacity - start)
+        timestamps = np.empty(count, dtype=np.float64)
+        values = np.empty((count, self.width), dtype=np.float64)
+        timestamps[:head] = self._timestamps[start:start + head]
+        values[:head] = self._values[start:start + head]
+        if head < count:
+            timestamps[head:] = self._timestamps[:count - head]
+            values[head:] = self._values[:count - head]
+        return timestamps, values
+
+def attach_shared_memory(name):
+    """
+    Opens an existing shared memory segment without taking ownership of it,
+    so it is not unlinked when this process exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    memory = shared_memory.SharedMemory(name)
+    resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer kept in a multiprocessing.shared_memory segment.
+
+    The producer creates the segment, other processes attach to it by name
+    and read it with the same lock-free since()/snapshot(). The sequence
+    counters live in the segment header, next to the capacity and width.
+    Writes in another process cannot notify wait(), so an attached buffer
+    polls the header instead.
+    """
+
+    HEADER_WORDS = 4
+
+    def __init__(self, name, capacity=None, width=None, create=False):
+        """
+        Initialize the SharedRingBuffer.
+
+        Args:
+            name (str): The name of the shared memory segment.
+            capacity (int, optional): The maximum number of samples kept. Needed with create.
+            width (int, optional): The number of values in each sample. Needed with create.
+            create (bool): Create the segment instead of attaching to an existing one.
+        """
+        if create:
+            size = (self.HEADER_WORDS + capacity * (width + 1)) * 8
+            self._memory = shared_memory.SharedMemory(name, create=True, size=size)
+        else:
+            self._memory = attach_shared_memory(name)
+        self.name = name
+        self._owner = create
+        self._arrived = threading.Condition()
+        self._header = np.ndarray(self.HEADER_WORDS, dtype=np.int64, buffer=self._memory.buf)
+        if create:
+            self._header[:] = (0, 0, capacity, width)
+        self.capacity = int(self._header[2])
+        self.width = int(self._header[3])
+        offset = self.HEADER_WORDS * 8
+        self._timestamps = np.ndarray(self.capacity, dtype=np.float64, buffer=self._memory.buf, offset=offset)
+        self._values = np.ndarray((self.capacity, self.width), dtype=np.float64, buffer=self._memory.buf,
+                                  offset=offset + self.capacity * 8)
+
+    @property
+    def _claimed(self):
+        return int(self._header[0])
+
+    @_claimed.setter
+    def _claimed(self, value):
+        self._header[0] = value
+
+    @property
+    def _written(self):
+        return int(self._header[1])
+
+    @_written.setter
+    def _written(self, value):
+        self._header[1] = value
+
+    def wait(self, sequence, timeout=None, interval=0.02):
+        """
+        Same as RingBuffer.wait(). An attached buffer checks the header every
+        interval seconds, as the producer cannot notify it.
+        """
+        if self._owner:
+            return super().wait(sequence, timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._written == sequence:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(interval if remaining is None else min(interval, remaining))
+        return True
+
+    def close(self):
+        """
+        Detaches from the segment. The buffer cannot be used afterwards.
+        """
+        self._header = self._timestamps = self._values = None
+        self._memory.close()
+
+    def unlink(self):
+        """
+        Removes the segment. Only the process that created it should call this.
+        """
+        self._memory.unlink()
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from . import auxiliary_modules as am
+
+IDLE = 'idle'
+MEASURING = 'measuring'
+PURGING = 'purging'
+DONE = 'done'
+ABORTED = 'aborted'
+
+class MeasurementScheduler:
+    """
+    Times one measurement run: the measurement window, then the purge phase.
+
+    Phases are derived from the monotonic clock at the moment they are asked
+    for, so nothing drifts with the polling rate of the caller. A run stopped
+    inside its measurement window is ABORTED, one stopped while purging is
+    DONE. Samples are resampled onto a fixed-rate grid aligned with the start
+    of the run.
+    """
+
+    def __init__(self, duration, purge, rate=10.0):
+        """
+        Initialize the MeasurementScheduler.
+
+        Args:
+            duration (float): Length of the measurement window in seconds (t_0, t_1, ...).
+            purge (float): Length of the purge phase in seconds (timeout_under_measure).
+            rate (float): Samples per second of the aligned grid.
+        """
+        self.duration = duration
+        self.purge = purge
+        self.rate = rate
+        self.started = None
+        self.started_monotonic = None
+        self.stopped = None
+
+    def start(self):
+        """
+        Starts the run now.
+        """
+        self.started_monotonic = time.monotonic()
+        self.started = am.precise_timestamp()
+
+    def stop(self):
+        """
+        Ends the run now, e.g. when the measurement is paused.
+        """
+        if self.started_monotonic is not None and self.stopped is None:
+            self.stopped = self.elapsed()
+
+    def elapsed(self):
+        if self.started_monotonic is None:
+            return 0.0
+        return time.monotonic() - self.started_monotonic
+
+    def phase(self):
+        """
+        Returns the current phase: IDLE, MEASURING, PURGING, DONE or ABORTED.
+        """
+        if self.started_monotonic is None:
+            return IDLE
+        if self.stopped is not None:
+            return ABORTED if self.stopped < self.duration else DONE
+        elapsed = self.elapsed()
+        if elapsed < self.duration:
+            return MEASURING
+        if elapsed < self.duration + self.purge:
+            return PURGING
+        return DONE
+
+    def remaining(self):
+        """
+        Returns the seconds left in the current phase.
+        """
+        elapsed = self.elapsed()
+        phase = self.phase()
+        if phase == MEASURING:
+            return self.duration - elapsed
+        if phase == PURGING:
+            return self.duration + self.purge - elapsed
+        return 0.0
+
+    def grid_times(self):
+        """
+        Returns the timestamps of the aligned grid over the measurement window.
+        """
+        count = int(round(self.duration * self.rate)) + 1
+        return self.started + np.arange(count) / self.rate
+
+    def to_grid(self, timestamps, values):
+        """
+        Resamples samples of the run onto the aligned grid by linear interpolation.
+        Grid points not covered by samples are NaN.
+
+        Args:
+            timestamps (np.ndarray): Sample times, increasing.
+            values (np.ndarray): Array of shape (samples, sensors).
+
+        Returns:
+            tuple: (grid timestamps, values of shape (grid points, sensors)).
+        """
+        grid = self.grid_times()
+        values = np.asarray(values, dtype=np.float64)
+        resampled = np.full((len(grid), values.shape[1]), np.nan)
+        if len(timestamps) >= 2:
+            for sensor in range(values.shape[1]):
+                resampled[:, sensor] = np.interp(grid, timestamps, values[:, sensor], left=np.nan, right=np.nan)
+        return grid, resampled
@@ -2,6 +2,10 @@ from serial.tools import list_ports
 
 import serial
 
+# Makes serial.serial_for_url() resolve nose:// URLs to the virtual devices.
+if f'{__package__}.handlers' not in serial.protocol_handler_packages:
+    serial.protocol_handler_packages.append(f'{__package__}.handlers')
+
 class SerialPortHandler:
     def __init__(self, logger, port_name, baud_rate=57600):
         """
@@ -18,7 +22,7 @@ class SerialPortHandler:
 
     def open_serial_connection(self):
         if self.port_name:
-            self.serial_connection = serial.Serial(self.port_name, self.baud_rate, timeout=2)
+            self.serial_connection = serial.serial_for_url(self.port_name, self.baud_rate, timeout=2)
         else:
             self.__logger.warning('Port name is not specified.')
 
@@ -30,18 +34,56 @@ class SerialPortHandler:
             self.__logger.warning('Serial connection is not open.')
         return None
 
+    def read_available(self, max_size=4096):
+        """
+        Reads all bytes waiting in the input buffer, up to max_size.
+        Blocks until at least one byte arrives or the timeout expires.
+
+        Args:
+            max_size (int): The maximum number of bytes to read.
+
+        Returns:
+            bytes: The data read, or None if the connection is not open.
+        """
+        if self.serial_connection:
+            size = max(1, min(self.serial_connection.in_waiting, max_size))
+            return self.serial_connection.read(size=size)
+        else:
+            self.__logger.warning('Serial connection is not open.')
+        return None
+
+    def reset_input_buffer(self):
+        """
+        Discards the bytes received but not read yet.
+        """
+        if self.serial_connection:
+            self.serial_connection.reset_input_buffer()
+
+    def is_open(self):
+        return bool(self.serial_connection and self.serial_connection.is_open)
+
     def close_serial_connection(self):
         if self.serial_connection:
             self.serial_connection.close()
 
 class PortScanner:
+    virtual_ports = []
+
+    @staticmethod
+    def register_virtual_port(url):
+        """
+        Adds a virtual device URL, e.g. 'nose://synthetic?rate=100', to the port list.
+        """
+        if url not in PortScanner.virtual_ports:
+            PortScanner.virtual_ports.append(url)
+
     @staticmethod
     def port_list():
         """
-        Scans and returns a list of available COM ports.
+        Scans and returns a list of available COM ports, followed by the registered virtual ports.
 
         Returns:
             list: A list of available COM ports.
         """
         port_list = [p.device for p in list_ports.comports()]
-        return port_list
\ No newline at end of file
+        return port_list + PortScanner.virtual_ports
\ No newline at end of file
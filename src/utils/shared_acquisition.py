@@ -0,0 +1,434 @@
+import json
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import metrics
+from .acquisition import shared_segment_name
+from .health import CONDITIONS
+from .ring_buffer import SharedRingBuffer, attach_shared_memory
+from .scheduler import MeasurementScheduler
+
+DIRECTORY_NAME = 'smartnose_devices'
+DIRECTORY_SIZE = 64 * 1024
+# The metrics of the acquisition process, for the /metrics of the dashboard workers.
+METRICS_NAME = 'smartnose_metrics'
+METRICS_SIZE = 64 * 1024
+METRICS_INTERVAL = 1.0
+STATISTICS = ('min', 'max', 'mean', 'std', 'ewma', 'window_min', 'window_max')
+
+START_RUN = 1
+PAUSE = 2
+
+# A version left odd this long belongs to a writer that died during a write.
+READ_TIMEOUT = 0.1
+
+def _state_dtype(n_sensors):
+    return np.dtype([
+        ('n_sensors', 'i8'),
+        ('alive', 'i8'),
+        ('version', 'i8'),
+        ('measuring', 'i8'),
+        ('run_started', 'f8'),
+        ('run_monotonic', 'f8'),
+        ('run_duration', 'f8'),
+        ('run_purge', 'f8'),
+        ('run_rate', 'f8'),
+        ('run_stopped', 'f8'),
+        ('count', 'i8'),
+        ('statistics', 'f8', (len(STATISTICS), n_sensors)),
+        ('health_count', 'i8'),
+        ('health_active', 'i8', (len(CONDITIONS), n_sensors)),
+        ('health_events', 'i8', (len(CONDITIONS), n_sensors)),
+        ('command_sequence', 'i8'),
+        ('command', 'i8'),
+        ('command_duration', 'f8'),
+        ('command_purge', 'f8'),
+        ('command_rate', 'f8'),
+    ])
+
+def _write_json(memory, payload):
+    """
+    Writes a JSON payload after a 16-byte header (version, length) under the
+    same sequence lock as _Segment.
+    """
+    header = np.ndarray(2, dtype=np.int64, buffer=memory.buf)
+    header[0] += 1
+    header[1] = len(payload)
+    memory.buf[16:16 + len(payload)] = payload
+    header[0] += 1
+    del header
+
+def _read_json(name, default):
+    """
+    Reads the JSON payload of a segment written by _write_json(), or returns
+    default if the segment does not exist or its writer died during a write.
+    """
+    try:
+        memory = attach_shared_memory(name)
+    except FileNotFoundError:
+        return default
+    try:
+        header = np.ndarray(2, dtype=np.int64, buffer=memory.buf)
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            version = int(header[0])
+            payload = bytes(memory.buf[16:16 + int(header[1])])
+            if version % 2 == 0 and int(header[0]) == version:
+                break
+            if time.monotonic() >= deadline:
+                payload = b''
+                break
+            time.sleep(0.001)
+        del header
+    finally:
+        memory.close()
+    return json.loads(payload) if payload else default
+
+class _Segment:
+    """
+    A shared memory segment viewed as one structured NumPy record.
+
+    State fields are written by the acquisition process under a sequence
+    lock: 'version' is odd while a write is in progress, readers retry until
+    they copied the record with the same even version before and after.
+    A version that stays odd for READ_TIMEOUT seconds reads as not alive.
+    """
+
+    def __init__(self, name, n_sensors=None, create=False):
+        if create:
+            dtype = _state_dtype(n_sensors)
+            self.memory = shared_memory.SharedMemory(name, create=True, size=dtype.itemsize)
+        else:
+            self.memory = attach_shared_memory(name)
+            n_sensors = int(np.ndarray(1, dtype=np.int64, buffer=self.memory.buf)[0])
+            dtype = _state_dtype(n_sensors)
+        self.record = np.ndarray((), dtype=dtype, buffer=self.memory.buf)
+        if create:
+            self.record['n_sensors'] = n_sensors
+            self.record['alive'] = 1
+
+    def read(self):
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            version = int(self.record['version'])
+            if version % 2 == 0:
+                copy = self.record.copy()
+                if int(self.record['version']) == version:
+                    return copy
+            if time.monotonic() >= deadline:
+                copy = self.record.copy()
+                copy['alive'] = 0
+                return copy
+            time.sleep(0.001)
+
+    def close(self):
+        self.record = None
+        self.memory.close()
+
+class AcquisitionPublisher:
+    """
+    Publishes the devices of an AcquisitionManager(shared=True) to other processes.
+
+    Every interval seconds it writes the device list to the directory
+    segment and the measurement state, statistics and health of every device to its
+    state segment, and carries out the start/pause commands the dashboard
+    workers left there. The samples themselves are in the shared ring buffers.
+    Every METRICS_INTERVAL seconds it also publishes the metrics of the process.
+    """
+
+    def __init__(self, logger, manager, interval=0.05):
+        """
+        Initialize the AcquisitionPublisher.
+
+        Args:
+            manager (AcquisitionManager): The manager of the acquisition process.
+            interval (float): Seconds between two publications.
+        """
+        self.manager = manager
+        self.interval = interval
+        self.__logger = logger
+        self._states = {}
+        self._handled = {}
+        self._directory = None
+        self._metrics = None
+        self._metrics_published = 0.0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._directory = shared_memory.SharedMemory(DIRECTORY_NAME, create=True, size=DIRECTORY_SIZE)
+            self._metrics = shared_memory.SharedMemory(METRICS_NAME, create=True, size=METRICS_SIZE)
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='acquisition-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops publishing and removes the directory, metrics and state segments.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for port_name in list(self._states):
+            self._remove(port_name)
+        if self._directory is not None:
+            self._directory.close()
+            self._directory.unlink()
+            self._directory = None
+        if self._metrics is not None:
+            self._metrics.close()
+            self._metrics.unlink()
+            self._metrics = None
+
+    def publish(self):
+        """
+        Publishes the device list and the state of every device once.
+        """
+        services = self.manager.services()
+        for port_name in set(self._states) - set(services):
+            self._remove(port_name)
+        for port_name, service in services.items():
+            state = self._states.get(port_name)
+            if state is None:
+                state = self._states[port_name] = _Segment(shared_segment_name(port_name, 'state'),
+                                                           service.n_sensors, create=True)
+                self._handled[port_name] = 0
+            self._execute(service, state.record)
+            self._write(service, state.record)
+        self._write_directory(sorted(services))
+        if time.monotonic() - self._metrics_published >= METRICS_INTERVAL:
+            self._write_metrics()
+
+    def _execute(self, service, record):
+        sequence = int(record['command_sequence'])
+        if sequence == self._handled[service.port_name]:
+            return
+        self._handled[service.port_name] = sequence
+        command = int(record['command'])
+        if command == START_RUN:
+            service.start_run(float(record['command_duration']), float(record['command_purge']),
+                              float(record['command_rate']))
+        elif command == PAUSE:
+            service.pause()
+
+    @staticmethod
+    def _write(service, record):
+        run = service.run
+        statistics = service.statistics.snapshot()
+        health = service.health.snapshot()
+        record['version'] += 1
+        record['measuring'] = service.is_measuring
+        if run is not None:
+            record['run_started'] = run.started
+            record['run_monotonic'] = run.started_monotonic
+            record['run_duration'] = run.duration
+            record['run_purge'] = run.purge
+            record['run_rate'] = run.rate
+            record['run_stopped'] = run.stopped if run.stopped is not None else -1
+        record['count'] = statistics['count']
+        record['statistics'] = [statistics[name] for name in STATISTICS]
+        record['health_count'] = health['count']
+        record['health_active'] = health['active']
+        record['health_events'] = health['events']
+        record['version'] += 1
+
+    def _write_directory(self, devices):
+        payload = json.dumps(devices).encode()
+        if len(payload) > DIRECTORY_SIZE - 16:
+            self.__logger.error('Too many devices to publish.')
+            return
+        _write_json(self._directory, payload)
+
+    def _write_metrics(self):
+        self._metrics_published = time.monotonic()
+        payload = json.dumps(metrics.registry.snapshot()).encode()
+        if len(payload) > METRICS_SIZE - 16:
+            self.__logger.error('Too many metrics to publish.')
+            return
+        _write_json(self._metrics, payload)
+
+    def _remove(self, port_name):
+        state = self._states.pop(port_name)
+        self._handled.pop(port_name, None)
+        state.record['alive'] = 0
+        state.close()
+        state.memory.unlink()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                self.__logger.error(f'Error publishing acquisition state: {e}')
+
+class SharedStatistics:
+    """
+    Read-only view of the StreamingStatistics published for a device.
+    """
+
+    def __init__(self, device):
+        self._device = device
+
+    @property
+    def count(self):
+        return int(self._device.state()['count'])
+
+    def snapshot(self):
+        state = self._device.state()
+        snapshot = {'count': int(state['count'])}
+        for name, values in zip(STATISTICS, state['statistics']):
+            snapshot[name] = values.copy()
+        return snapshot
+
+class SharedHealth:
+    """
+    Read-only view of the SensorHealth published for a device.
+    """
+
+    def __init__(self, device):
+        self._device = device
+
+    def snapshot(self):
+        state = self._device.state()
+        return {
+            'count': int(state['health_count']),
+            'active': state['health_active'].astype(bool),
+            'events': state['health_events'].copy(),
+        }
+
+class SharedDevice:
+    """
+    A device of the acquisition process, seen from a dashboard worker.
+
+    Offers the parts of AcquisitionService the dashboard uses: the ring
+    buffer, the statistics and health, the measurement state and start_run()/pause(),
+    which are passed to the acquisition process as commands.
+    """
+
+    def __init__(self, port_name):
+        self.port_name = port_name
+        self._state = _Segment(shared_segment_name(port_name, 'state'))
+        self.buffer = SharedRingBuffer(shared_segment_name(port_name, 'ring'))
+        self.n_sensors = self.buffer.width
+        self.statistics = SharedStatistics(self)
+        self.health = SharedHealth(self)
+        self._run = None
+
+    @property
+    def alive(self):
+        return int(self.state()['alive']) == 1
+
+    @property
+    def is_measuring(self):
+        return bool(self.state()['measuring'])
+
+    @property
+    def run(self):
+        """
+        The MeasurementScheduler of the current run, rebuilt from the published state.
+        """
+        state = self.state()
+        if state['run_monotonic'] == 0:
+            return None
+        if self._run is None or self._run.started_monotonic != float(state['run_monotonic']):
+            run = MeasurementScheduler(float(state['run_duration']), float(state['run_purge']),
+                                       float(state['run_rate']))
+            run.started = float(state['run_started'])
+            run.started_monotonic = float(state['run_monotonic'])
+            self._run = run
+        self._run.stopped = float(state['run_stopped']) if state['run_stopped'] >= 0 else None
+        return self._run
+
+    @property
+    def run_started(self):
+        run = self.run
+        return run.started if run is not None else None
+
+    def state(self):
+        return self._state.read()
+
+    def start_run(self, duration, purge, rate=10.0):
+        self._command(START_RUN, duration, purge, rate)
+        return True
+
+    def pause(self):
+        self._command(PAUSE)
+
+    def _command(self, command, duration=0.0, purge=0.0, rate=0.0):
+        """
+        Leaves a command for the publisher, which acts on a new command_sequence.
+
+        The increment is not atomic across processes: when two workers send a
+        command at the same moment, one of them can be lost or carry the
+        other's arguments. Commands come from user clicks, so this is accepted.
+        """
+        # Arguments first, the sequence number last.
+        record = self._state.record
+        record['command'] = command
+        record['command_duration'] = duration
+        record['command_purge'] = purge
+        record['command_rate'] = rate
+        record['command_sequence'] += 1
+
+    def close(self):
+        self.buffer.close()
+        self._state.close()
+
+class SharedAcquisitionClient:
+    """
+    Stands in for AcquisitionManager in a process that only reads, e.g. one
+    of several web workers. Devices are attached on first use and dropped
+    when the acquisition process releases them.
+    """
+
+    def __init__(self, logger):
+        self.__logger = logger
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        with self._lock:
+            devices, self._devices = list(self._devices.values()), {}
+        for device in devices:
+            device.close()
+
+    def devices(self):
+        """
+        Returns the ports published by the acquisition process.
+        """
+        return _read_json(DIRECTORY_NAME, [])
+
+    def metrics(self):
+        """
+        Returns the metrics.registry.snapshot() published by the acquisition
+        process, at most METRICS_INTERVAL seconds old, or {} if there is none.
+        """
+        return _read_json(METRICS_NAME, {})
+
+    def service(self, port_name):
+        """
+        Returns the SharedDevice of a port, or None if it is not published.
+        """
+        if not port_name:
+            return None
+        with self._lock:
+            device = self._devices.get(port_name)
+            if device is not None and not device.alive:
+                del self._devices[port_name]
+                device.close()
+                device = None
+            if device is None:
+                try:
+                    device = self._devices[port_name] = SharedDevice(port_name)
+                except FileNotFoundError:
+                    self.__logger.warning(f'Device {port_name} is not published by the acquisition process.')
+                    return None
+            return device
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+
+FEATURES = ('rise_slope', 'peak', 'area', 'recovery')
+
+def extract_features(timestamps, values):
+    """
+    Extracts the response features of one measurement window, for all sensors at once.
+
+    Per sensor: the rise slope from the window start to the peak, the peak
+    height above the baseline, the area above the baseline and the fraction
+    of the peak recovered by the end of the window. The baseline is the first
+    sample of the window.
+
+    Args:
+        timestamps (np.ndarray): Sample times in seconds, increasing.
+        values (np.ndarray): Array of shape (samples, sensors).
+
+    Returns:
+        np.ndarray: Feature vector ordered sensor by sensor, len(FEATURES) per sensor.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        raise ValueError('A measurement window needs at least two samples.')
+
+    elapsed = timestamps - timestamps[0]
+    response = values - values[0]
+    peak_index = response.argmax(axis=0)
+    peak = response[peak_index, np.arange(values.shape[1])]
+    time_to_peak = elapsed[peak_index]
+    rise_slope = np.divide(peak, time_to_peak, out=np.zeros_like(peak), where=time_to_peak > 0)
+    area = ((response[1:] + response[:-1]) / 2 * np.diff(elapsed)[:, None]).sum(axis=0)
+    recovery = np.divide(peak - response[-1], peak, out=np.zeros_like(peak), where=peak > 0)
+    return np.column_stack((rise_slope, peak, area, recovery)).reshape(-1)
+
+class SignatureLibrary:
+    """
+    Labelled reference signatures, stored in DataBase, with nearest-neighbour classification.
+
+    Features are z-scored with the library statistics so that slopes, areas
+    and ratios weigh the same. Queries are answered in batches with a
+    NumPy distance matrix, computed in chunks to bound memory.
+    """
+
+    def __init__(self, base, chunk_size=4096):
+        """
+        Initialize the SignatureLibrary.
+
+        Args:
+            base (DataBase): The database the signatures are kept in.
+            chunk_size (int): The number of queries per distance matrix block.
+        """
+        self.base = base
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._loaded = {}
+        self.base.create_signature_table()
+
+    def add(self, label, mode, features):
+        """
+        Stores a reference signature for the measurement mode.
+        """
+        self.base.write_signature(label, mode, np.asarray(features, dtype=np.float64))
+        with self._lock:
+            self._loaded.pop(mode, None)
+
+    def classify(self, mode, features, k=1):
+        """
+        Finds the nearest references of one or more feature vectors.
+
+        Args:
+            mode (int): The measurement mode the features were taken with.
+            features (array-like): One vector or an array of shape (queries, features).
+            k (int): The number of neighbours voting for the label.
+
+        Returns:
+            list: (label, distance) per query, or None per query when the library
+            of the mode is empty.
+        """
+        queries = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        labels, references, mean, scale, squared_norms = self._references(mode, queries.shape[1])
+        if len(references) == 0:
+            return [None] * len(queries)
+        k = min(k, len(references))
+
+        results = []
+        for start in range(0, len(queries), self.chunk_size):
+            block = (queries[start:start + self.chunk_size] - mean) / scale
+            distances = (block ** 2).sum(axis=1)[:, None] + squared_norms[None, :] - 2 * block @ references.T
+            np.maximum(distances, 0, out=distances)
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            for row, candidates in enumerate(nearest):
+                candidates = candidates[np.argsort(distances[row, candidates])]
+                # Counted nearest first, so a tie goes to the closest label.
+                votes = {}
+                for candidate in candidates:
+                    votes[labels[candidate]] = votes.get(labels[candidate], 0) + 1
+                label = max(votes, key=votes.get)
+                results.append((label, float(np.sqrt(distances[row, candidates[0]]))))
+        return results
+
+    def _references(self, mode, n_features):
+        with self._lock:
+            loaded = self._loaded.get(mode)
+            if loaded is None:
+                kept = [(label, vector) for label, vector in zip(*self.base.read_signatures(mode))
+                        if len(vector) == n_features]
+                labels = [label for label, _ in kept]
+                features = np.array([vector for _, vector in kept], dtype=np.float64).reshape(-1, n_features)
+                mean = features.mean(axis=0) if len(features) else np.zeros(n_features)
+                scale = features.std(axis=0) if len(features) else np.ones(n_features)
+                scale[scale == 0] = 1.0
+                references = (features - mean) / scale
+                loaded = (np.array(labels, dtype=object), references, mean, scale, (references ** 2).sum(axis=1))
+                self._loaded[mode] = loaded
+            return loaded
@@ -0,0 +1,133 @@
+import collections
+import threading
+
+import numpy as np
+
+from . import metrics
+
+class SnapshotCache:
+    """
+    Least recently used cache of values derived from the buffered samples,
+    e.g. figures, keyed by whatever identifies them plus the data version.
+
+    Each value is computed once: concurrent callers asking for a key that is
+    being computed wait for that result instead of computing it again.
+    """
+
+    def __init__(self, max_entries=64):
+        """
+        Initialize the SnapshotCache.
+
+        Args:
+            max_entries (int): The number of values kept before the least recently used is evicted.
+        """
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        """
+        Returns the value of key, calling compute() to produce it on a miss.
+
+        Args:
+            key (tuple): Hashable key, including the data version.
+            compute (callable): Produces the value; called without arguments.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    metrics.cache_hits.inc()
+                    return self._entries[key]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # Another caller is computing it; if that fails, try again ourselves.
+            pending.wait()
+
+        metrics.cache_misses.inc()
+        try:
+            value = compute()
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+        return value
+
+class DeltaFeed:
+    """
+    Cuts the samples of one ring buffer into consecutive deltas, each encoded
+    once and handed to every reader that reached its start.
+
+    A reader that is behind, or joined at an arbitrary sequence, first gets
+    one delta of its own up to the newest shared one and follows the shared
+    deltas from then on.
+    """
+
+    def __init__(self, buffer, encode, max_samples, history=256):
+        """
+        Initialize the DeltaFeed.
+
+        Args:
+            buffer (RingBuffer): The buffer the samples are read from.
+            encode (callable): encode(x_values, values, end) -> payload, with
+                x_values the sample sequence numbers and end the next sequence.
+            max_samples (int): The maximum number of samples in one delta.
+            history (int): The number of shared deltas kept.
+        """
+        self.buffer = buffer
+        self.encode = encode
+        self.max_samples = max_samples
+        self.history = history
+        self._deltas = {}
+        self._order = collections.deque()
+        self._head = None
+        self._lock = threading.Lock()
+
+    def read(self, sequence):
+        """
+        Returns the payloads of the samples written after sequence.
+
+        Returns:
+            tuple: (payloads, sequence) where sequence is the value to pass to the next call.
+        """
+        with self._lock:
+            self._advance()
+            payloads = []
+            if sequence > self._head:
+                # The buffer was recreated behind our back; follow the new one.
+                sequence = self._head
+            if sequence not in self._deltas and sequence < self._head:
+                payloads.append(self.encode(*self._slice(sequence, self._head)))
+                sequence = self._head
+            while sequence in self._deltas:
+                sequence, payload = self._deltas[sequence]
+                payloads.append(payload)
+            return payloads, sequence
+
+    def _advance(self):
+        latest = self.buffer.sequence
+        if self._head is None:
+            self._head = latest
+        elif latest > self._head:
+            start = self._head
+            x_values, values, end = self._slice(start, latest)
+            self._deltas[start] = (end, self.encode(x_values, values, end))
+            self._order.append(start)
+            self._head = end
+            while len(self._order) > self.history:
+                del self._deltas[self._order.popleft()]
+
+    def _slice(self, start, stop):
+        _, values, sequence = self.buffer.since(start, self.max_samples)
+        values = values[:max(len(values) - (sequence - stop), 0)]
+        return np.arange(stop - len(values), stop), values, stop
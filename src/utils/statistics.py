@@ -0,0 +1,134 @@
+import collections
+
+import numpy as np
+
+class StreamingStatistics:
+    """
+    Per-sensor statistics updated as samples arrive, at constant cost per sample.
+
+    Keeps the running min/max, mean and variance (Welford, merged batch-wise
+    with Chan's formula), an exponentially weighted moving average and the
+    min/max over the last window samples (one monotonic deque per sensor and
+    extremum).
+    """
+
+    def __init__(self, n_sensors, window=600, alpha=0.1):
+        """
+        Initialize the StreamingStatistics.
+
+        Args:
+            n_sensors (int): The number of values in each sample.
+            window (int): The number of newest samples of the sliding extrema.
+            alpha (float): The EWMA smoothing factor.
+        """
+        self.n_sensors = n_sensors
+        self.window = window
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.min = np.full(self.n_sensors, np.inf)
+        self.max = np.full(self.n_sensors, -np.inf)
+        self.mean = np.zeros(self.n_sensors)
+        self._m2 = np.zeros(self.n_sensors)
+        self.ewma = np.zeros(self.n_sensors)
+        self._window_min = [collections.deque() for _ in range(self.n_sensors)]
+        self._window_max = [collections.deque() for _ in range(self.n_sensors)]
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros(self.n_sensors)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def window_min(self):
+        return np.array([self._front(d) for d in self._window_min])
+
+    @property
+    def window_max(self):
+        return np.array([self._front(d) for d in self._window_max])
+
+    @staticmethod
+    def _front(window):
+        # The deque may be emptied for a moment by the updating thread.
+        try:
+            return window[0][1]
+        except IndexError:
+            return np.nan
+
+    def update(self, values):
+        """
+        Adds a batch of samples.
+
+        Args:
+            values (array-like): Array of shape (samples, n_sensors).
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.n_sensors)
+        size = len(values)
+        if size == 0:
+            return
+
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        total = self.count + size
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * size / total
+        self._m2 = self._m2 + batch_m2 + delta ** 2 * self.count * size / total
+
+        # ewma_k = (1 - a) * ewma_(k-1) + a * x_k, unrolled over the batch.
+        decay = 1 - self.alpha
+        if self.count == 0:
+            self.ewma = values[0].copy()
+            values_for_ewma, size_for_ewma = values[1:], size - 1
+        else:
+            values_for_ewma, size_for_ewma = values, size
+        if size_for_ewma:
+            weights = self.alpha * decay ** np.arange(size_for_ewma - 1, -1, -1)
+            self.ewma = decay ** size_for_ewma * self.ewma + weights @ values_for_ewma
+
+        first = self.count
+        self.count = total
+        for sensor in range(self.n_sensors):
+            column = values[:, sensor]
+            self._slide(self._window_min[sensor], column, first, 1.0)
+            self._slide(self._window_max[sensor], column, first, -1.0)
+
+    def _slide(self, window, values, first, sign):
+        """
+        Pushes values into a monotonic deque of (index, value) pairs whose
+        front is the minimum (sign 1) or maximum (sign -1) of the last
+        self.window samples. Every value is pushed and popped at most once.
+        """
+        if len(values) > self.window:
+            first += len(values) - self.window
+            values = values[-self.window:]
+        oldest = first + len(values) - self.window
+        for index, value in enumerate(values.tolist(), start=first):
+            key = sign * value
+            while window and sign * window[-1][1] >= key:
+                window.pop()
+            window.append((index, value))
+        while window[0][0] < oldest:
+            window.popleft()
+
+    def snapshot(self):
+        """
+        Returns every statistic as a dict of per-sensor arrays.
+        """
+        return {
+            'count': self.count,
+            'min': self.min.copy(),
+            'max': self.max.copy(),
+            'mean': self.mean.copy(),
+            'std': self.std,
+            'ewma': self.ewma.copy(),
+            'window_min': self.window_min,
+            'window_max': self.window_max,
+        }
@@ -0,0 +1,170 @@
+import time
+
+import numpy as np
+
+from .archive import SessionArchive
+from .protocol import ProtocolHandler, VALUE_MASK, WORD_SIZE
+
+class VirtualSensorDevice:
+    """
+    Synthetic nose that emits valid frames at a fixed sample rate.
+
+    Every sensor follows the same exposure cycle (rise, plateau, recovery)
+    with its own baseline and amplitude, plus Gaussian noise. A fraction of
+    the frames can be corrupted to exercise the parser's resynchronization.
+    """
+
+    def __init__(self, n_sensors=8, rate=10.0, noise=0.002, corruption=0.0, period=60.0, seed=None):
+        """
+        Initialize the VirtualSensorDevice.
+
+        Args:
+            n_sensors (int): The number of channels in one frame.
+            rate (float): Samples per second.
+            noise (float): Noise standard deviation relative to the full scale.
+            corruption (float): Probability that a frame loses or alters one byte.
+            period (float): Length of one exposure cycle in seconds.
+            seed (int, optional): Seed of the random generator.
+        """
+        self.n_sensors = n_sensors
+        self.rate = rate
+        self.noise = noise
+        self.corruption = corruption
+        self.period = period
+        self.frame_size = n_sensors * WORD_SIZE
+        self._rng = np.random.default_rng(seed)
+        self._baseline = self._rng.uniform(0.1, 0.3, n_sensors) * VALUE_MASK
+        self._amplitude = self._rng.uniform(0.2, 0.5, n_sensors) * VALUE_MASK
+        self._time_constant = self._rng.uniform(2.0, 6.0, n_sensors)
+        self._generated = 0
+        self._started = None
+
+    def start(self):
+        """
+        Starts the device clock. Samples become due from now on.
+        """
+        self._started = time.monotonic()
+        self._generated = 0
+
+    def samples(self, count):
+        """
+        Generates the next count samples.
+
+        Returns:
+            np.ndarray: Array of shape (count, n_sensors) with 28-bit values.
+        """
+        t = (self._generated + np.arange(count)) / self.rate
+        self._generated += count
+        phase = (t % self.period)[:, None]
+        exposure = self.period / 3
+        rise = 1 - np.exp(-np.minimum(phase, exposure) / self._time_constant)
+        recovery = np.exp(-np.maximum(phase - exposure, 0) / self._time_constant)
+        values = self._baseline + self._amplitude * rise * recovery
+        values += self._rng.normal(0, self.noise * VALUE_MASK, values.shape)
+        return np.clip(np.rint(values), 0, VALUE_MASK).astype(np.uint32)
+
+    def frames(self, count):
+        """
+        Generates the next count samples encoded as frames.
+
+        Returns:
+            bytes: The frames, possibly corrupted.
+        """
+        return self._corrupt(ProtocolHandler.encode_frames(self.samples(count)))
+
+    def read_due(self, max_bytes=None):
+        """
+        Returns the frames of every sample due since the last call.
+
+        Args:
+            max_bytes (int, optional): The size of the reader's buffer. Older
+                due samples that would not fit are skipped without being generated.
+        """
+        if self._started is None:
+            self.start()
+        due = int((time.monotonic() - self._started) * self.rate) - self._generated
+        if max_bytes is not None and due > max_bytes // self.frame_size:
+            self._generated += due - max_bytes // self.frame_size
+            due = max_bytes // self.frame_size
+        return self.frames(due) if due > 0 else b''
+
+    def time_to_next(self):
+        """
+        Returns the number of seconds until the next sample is due.
+        """
+        if self._started is None:
+            return 0.0
+        return max(0.0, self._started + self._generated / self.rate - time.monotonic())
+
+    def _corrupt(self, data):
+        if not self.corruption or not data:
+            return data
+        frames = np.frombuffer(data, dtype=np.uint8).reshape(-1, self.frame_size).copy()
+        bad = np.flatnonzero(self._rng.random(len(frames)) < self.corruption)
+        if len(bad) == 0:
+            return data
+        offsets = self._rng.integers(0, self.frame_size, len(bad))
+        drop = self._rng.random(len(bad)) < 0.5
+        flip = ~drop
+        frames[bad[flip], offsets[flip]] ^= self._rng.integers(1, 256, int(flip.sum()), dtype=np.uint8)
+        keep = np.ones(frames.shape, dtype=bool)
+        keep[bad[drop], offsets[drop]] = False
+        return frames[keep].tobytes()
+
+class ReplayDevice:
+    """
+    Replays a recorded session archive as frames, 1x to 100x faster than recorded.
+    """
+
+    def __init__(self, archive_path, speed=1.0, loop=False):
+        """
+        Initialize the ReplayDevice.
+
+        Args:
+            archive_path (str): The session archive to replay.
+            speed (float): Replay speed factor, between 1 and 100.
+            loop (bool): Start over when the end of the archive is reached.
+        """
+        if not 1.0 <= speed <= 100.0:
+            raise ValueError(f'Replay speed must be between 1 and 100, got {speed}.')
+        self.archive = SessionArchive(archive_path)
+        self.n_sensors = self.archive.n_sensors
+        self.speed = speed
+        self.loop = loop
+        self._deltas = self.archive.records['delta']
+        self._position = 0
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._position = 0
+
+    def read_due(self, max_bytes=None):
+        """
+        Returns the frames of every record due since the last call.
+
+        Args:
+            max_bytes (int, optional): The size of the reader's buffer. Older
+                due records that would not fit are skipped.
+        """
+        if self._started is None:
+            self.start()
+        if self._position >= len(self._deltas):
+            if not self.loop or len(self._deltas) == 0:
+                return b''
+            self.start()
+        elapsed = (time.monotonic() - self._started) * self.speed * 1e6
+        end = int(np.searchsorted(self._deltas, elapsed, 'right'))
+        if end <= self._position:
+            return b''
+        if max_bytes is not None:
+            self._position = max(self._position, end - max_bytes // (self.n_sensors * WORD_SIZE))
+        values = self.archive.values[self._position:end]
+        self._position = end
+        return ProtocolHandler.encode_frames(values)
+
+    def time_to_next(self):
+        if self._started is None or self._position >= len(self._deltas):
+            return 0.0
+        due = self._started + self._deltas[self._position] / 1e6 / self.speed
+        return max(0.0, due - time.monotonic())